@@ -0,0 +1,113 @@
+import asyncio
+from blackjack import Game
+from pacing import Pacing
+
+# asyncio game loop: every table is a coroutine, players decide through
+# their acall() coroutines and the animation delays are asyncio.sleep calls
+# scheduled by the table's own Pacing, so a single event loop can host many
+# tables at once. Tables are headless, the state of a table is read from its
+# Game object (or its event log).
+
+
+class AsyncTable:
+
+    def __init__(self, human_players=0, computer_players=1, input_sources=(),
+                 pace=1.0, rng=None):
+        """
+        Class AsyncTable - a blackjack table played on the asyncio event loop.
+        Attributes:
+        game = (class Game) headless game holding the table
+        pacing = (class Pacing) scheduler of the table's delays, animations
+        are skipped while only bots are seated
+        rounds = (int) number of rounds played
+        :param human_players: (int) number of human players
+        :param computer_players: (int) number of computer players
+        :param input_sources: (list) input source coroutine function of
+        every human player (see HumanPlayer.acall), the keyboard if missing
+        :param pace: (float) scale of the animation delays (0 for none)
+        :param rng: (random.Random) random number generator of the table
+        """
+        self.game = Game(human_players, computer_players, headless=True,
+                         rng=rng)
+        self.game.seat_players()
+        humans = sorted((player for player in self.game.table
+                         if player.type == 'h'), key=lambda player: player.id)
+        for player, source in zip(humans, input_sources):
+            player.input_source = source
+        self.pacing = Pacing(scale=pace)
+        self.pacing.bots_only = not human_players
+        self.rounds = 0
+
+    async def play_round(self):
+        """
+        This coroutine plays a round at the table with the same rules as
+        Game.play: the dealer deals, every player is polled until they stay
+        or reach 21 and the winners are determined
+        :return: (list(class Player)) the winners of the round
+        """
+        game = self.game
+        dealer = game.dealer
+        game.deck.start_round()
+        self.pacing.start_round()
+        if game.log is not None:
+            game.log.new_round()
+        dealer.deal(game.table)
+        for _ in game.table:
+            await self.pacing.adelay("deal")
+        if game.rules.insurance:
+            dealer.offer_insurance(game.table)
+        dealer_blackjack = game.rules.peek and dealer.peek()
+        for player in game.table:
+            status = "hit"
+            if player is dealer:
+                player.flip_card_up()
+            elif dealer_blackjack:
+                status = None
+            while status is not None:
+                while player.score < 21 and status == "hit":
+                    status = await dealer.apoll(player, self.pacing)
+                status = dealer.next_hand(player)
+            game.settle(player)
+        winners = list(game.find_winners())
+        if game.results is not None:
+            game.results.record_round(game)
+        self.rounds += 1
+        game.reset_round()
+        return winners
+
+    async def play(self, rounds):
+        """
+        This coroutine plays several rounds in a row at the table
+        :param rounds: (int) number of rounds to be played
+        :return: (list(list(str))) names of the winners of every round
+        """
+        results = []
+        for _ in range(rounds):
+            winners = await self.play_round()
+            results.append([player.name for player in winners])
+        return results
+
+
+async def run_tables(tables, rounds):
+    """
+    This coroutine plays 'rounds' rounds at every table concurrently
+    :param tables: (list(AsyncTable)) tables to be played
+    :param rounds: (int) number of rounds per table
+    :return: (list) results of AsyncTable.play for every table
+    """
+    return await asyncio.gather(*(table.play(rounds) for table in tables))
+
+
+def host_tables(count, computer_players=5, rounds=1, pace=1.0):
+    """
+    This function hosts 'count' bot tables on one event loop until they
+    have all played 'rounds' rounds
+    :param count: (int) number of tables
+    :param computer_players: (int) number of bots per table
+    :param rounds: (int) number of rounds per table
+    :param pace: (float) scale of the animation delays (0 for none)
+    :return: (list) results of AsyncTable.play for every table
+    """
+    tables = [AsyncTable(0, computer_players, pace=pace)
+              for _ in range(count)]
+    return asyncio.run(run_tables(tables, rounds))
@@ -0,0 +1,251 @@
+import random
+from array import array
+from deck import Deck, card_ranks
+from hand import (empty_hand, num_states, num_ranks, transitions, hand_totals,
+                  hand_blackjack, hand_bust)
+from dealer_odds import rank_classes
+from rules import can_hit
+from strategies import DecisionView, Strategy, hit
+
+# Batch engine: plays many independent rounds of bots against the dealer at
+# once. Every round owns its own shoe, shuffled lazily (one Fisher-Yates swap
+# per card dealt). Instead of walking each round to completion, a seat is
+# played across all rounds of the batch together: the rounds where the seat
+# still hits form the active mask, one card is dealt to each of them and the
+# mask shrinks until every hand stands or busts. Seats played by a strategy
+# plugin (see strategies.py) get the decisions of all their active rounds
+# from a single call per card dealt.
+dealer_threshold = 17  # the dealer hits below this score (see Dealer.decide)
+batch_size = 4096  # rounds played together
+
+
+def hit_table(threshold):
+    """
+    This function builds the decision table of a threshold player (see
+    ComputerPlayer.decide): hit while the score is below the threshold and
+    the hand is not yet 21 or busted
+    :param threshold: (int) score at or above which the player stays
+    :return: (bytes) 1 for states in which the player hits, indexed by state
+    """
+    return bytes(hand_totals[state] < min(threshold, 21)
+                 and not hand_bust[state] for state in range(num_states))
+
+
+def outcome_table():
+    """
+    This function precomputes the result of every pair of player and dealer
+    final hands: a natural blackjack beats any other 21, a busted player
+    always loses, else the higher score wins
+    :return: (array('b')) 1 for a win, 0 for a push and -1 for a loss,
+    indexed by player state * num_states + dealer state
+    """
+    outcomes = array('b', bytes(num_states * num_states))
+    for player in range(num_states):
+        for dealer in range(num_states):
+            if hand_bust[player]:
+                result = -1
+            elif hand_blackjack[player] != hand_blackjack[dealer]:
+                result = 1 if hand_blackjack[player] else -1
+            elif hand_bust[dealer]:
+                result = 1
+            else:
+                result = (hand_totals[player] > hand_totals[dealer]) - (
+                        hand_totals[player] < hand_totals[dealer])
+            outcomes[player * num_states + dealer] = result
+    return outcomes
+
+
+outcomes = outcome_table()
+
+
+class BatchShoes:
+
+    def __init__(self, rounds, decks=1, rng=random):
+        """
+        Class BatchShoes - one shoe per round of a batch, stored back to back
+        in a single bytearray of rank indices. Attributes:
+        size = (int) number of cards in each shoe
+        ranks = (bytearray) rank indices of all the shoes
+        dealt = (list(int)) number of cards dealt from each shoe
+        :param rounds: (int) number of rounds (shoes) in the batch
+        :param decks: (int) number of decks in each shoe
+        :param rng: random number generator (random.Random or the random
+        module)
+        """
+        shoe = bytes(card_ranks[code] for code in Deck(decks)._cards)
+        self.size = len(shoe)
+        self.ranks = bytearray(shoe * rounds)
+        self.dealt = [0] * rounds
+        self.rng = rng
+
+    def draw(self, active):
+        """
+        This function deals one card from the shoe of every active round,
+        picking it uniformly among the cards left in that shoe
+        :param active: (list(int)) indices of the rounds to deal to
+        :return: (list(int)) rank index of the card dealt to each active round
+        """
+        shoes = self.ranks
+        dealt = self.dealt
+        size = self.size
+        rand = self.rng.random
+        cards = []
+        for round_index in active:
+            count = dealt[round_index]
+            top = round_index * size + count
+            pick = top + int(rand() * (size - count))
+            card = shoes[pick]
+            shoes[pick] = shoes[top]
+            shoes[top] = card
+            dealt[round_index] = count + 1
+            cards.append(card)
+        return cards
+
+
+def play_hands(shoes, hands, hits):
+    """
+    This function plays one seat across all rounds of a batch, dealing a
+    card to every round in which the seat still hits
+    :param shoes: (BatchShoes) shoes of the batch
+    :param hands: (list(int)) state of the seat's hand in every round,
+    updated in place
+    :param hits: (bytes) decision table (see hit_table)
+    :return: None
+    """
+    active = [index for index, state in enumerate(hands) if hits[state]]
+    while active:
+        for index, card in zip(active, shoes.draw(active)):
+            hands[index] = transitions[hands[index] * num_ranks + card]
+        active = [index for index in active if hits[hands[index]]]
+
+
+def play_strategy_hands(shoes, hands, upcards, strategy):
+    """
+    This function plays one seat across all rounds of a batch with a
+    strategy plugin, asking the strategy for the decisions of all the rounds
+    in which the seat is still playing at once (hit or stand only)
+    :param shoes: (BatchShoes) shoes of the batch
+    :param hands: (list(int)) state of the seat's hand in every round,
+    updated in place
+    :param upcards: (array('B')) value class of the dealer's face up card in
+    every round
+    :param strategy: (strategies.Strategy) strategy of the seat
+    :return: None
+    """
+    active = [index for index, state in enumerate(hands)
+              if hand_totals[state] < 21]
+    actions = array('B', [can_hit]) * len(active)
+    while active:
+        view = DecisionView(array('B', [hands[index] for index in active]),
+                            array('B', [upcards[index] for index in active]),
+                            actions[:len(active)], array('I', active))
+        active = [index for index, decision in
+                  zip(active, strategy.decide(view)) if decision == hit]
+        for index, card in zip(active, shoes.draw(active)):
+            hands[index] = transitions[hands[index] * num_ranks + card]
+        active = [index for index in active if hand_totals[hands[index]] < 21]
+
+
+def deal_hands(shoes, rounds, upcards=None):
+    """
+    This function deals a two card hand in every round of a batch
+    :param shoes: (BatchShoes) shoes of the batch
+    :param rounds: (int) number of rounds in the batch
+    :param upcards: (array('B')) if given, the value class of the first card
+    of every hand is appended to it (the dealer's face up card)
+    :return: (list(int)) state of the hand dealt in every round
+    """
+    everyone = range(rounds)
+    firsts = shoes.draw(everyone)
+    if upcards is not None:
+        upcards.extend([rank_classes[card] for card in firsts])
+    hands = [transitions[empty_hand * num_ranks + card] for card in firsts]
+    return [transitions[state * num_ranks + card]
+            for state, card in zip(hands, shoes.draw(everyone))]
+
+
+def simulate_batch(thresholds, rounds, decks=1, seed=None, rng=None):
+    """
+    This function plays 'rounds' independent rounds in which every threshold
+    bot plays against the dealer, a batch of rounds at a time
+    :param thresholds: (list) threshold (int) of every bot at the table, or
+    its strategy plugin (strategies.Strategy)
+    :param rounds: (int) number of rounds to be played
+    :param decks: (int) number of decks in each shoe
+    :param seed: (int) seed of the random number generator
+    :param rng: (random.Random) random number generator (overrides seed)
+    :return: (dict) 'dealer': array('B') of the dealer's final score per
+    round, 'scores': list with an array('B') of final scores per bot and
+    'outcomes': list with an array('b') per bot of 1 (win), 0 (push) or -1
+    (loss) against the dealer
+    """
+    rng = rng or random.Random(seed)
+    seat_hits = [None if isinstance(threshold, Strategy) else
+                 hit_table(threshold) for threshold in thresholds]
+    dealer_hits = hit_table(dealer_threshold)
+    results = {"dealer": array('B'),
+               "scores": [array('B') for _ in thresholds],
+               "outcomes": [array('b') for _ in thresholds]}
+    done = 0
+    while done < rounds:
+        size = min(batch_size, rounds - done)
+        shoes = BatchShoes(size, decks, rng)
+        seats = [deal_hands(shoes, size) for _ in thresholds]
+        upcards = array('B')
+        dealer = deal_hands(shoes, size, upcards)
+        for hands, hits, strategy in zip(seats, seat_hits, thresholds):
+            if hits is None:
+                play_strategy_hands(shoes, hands, upcards, strategy)
+            else:
+                play_hands(shoes, hands, hits)
+        play_hands(shoes, dealer, dealer_hits)
+        results["dealer"].extend([hand_totals[state] for state in dealer])
+        for seat, hands in enumerate(seats):
+            results["scores"][seat].extend(
+                [hand_totals[state] for state in hands])
+            results["outcomes"][seat].extend(
+                [outcomes[state * num_states + house]
+                 for state, house in zip(hands, dealer)])
+        done += size
+    return results
+
+
+def threshold_sweep(thresholds, rounds, decks=1, seed=None):
+    """
+    This function compares threshold bots seated at the same table over
+    'rounds' rounds against the dealer
+    :param thresholds: (list(int)) thresholds to be compared
+    :param rounds: (int) number of rounds to be played
+    :param decks: (int) number of decks in each shoe
+    :param seed: (int) seed of the random number generator
+    :return: (dict) for every threshold, the 'win', 'push' and 'loss' rates
+    and the 'edge' (mean result per hand)
+    """
+    results = simulate_batch(thresholds, rounds, decks, seed)
+    sweep = {}
+    for threshold, seat_outcomes in zip(thresholds, results["outcomes"]):
+        wins = seat_outcomes.count(1)
+        losses = seat_outcomes.count(-1)
+        sweep[threshold] = {"win": wins / rounds,
+                            "push": (rounds - wins - losses) / rounds,
+                            "loss": losses / rounds,
+                            "edge": (wins - losses) / rounds}
+    return sweep
+
+
+def leaderboard(strategies, rounds, decks=1, seed=None):
+    """
+    This function ranks strategy plugins seated at the same table by their
+    mean result per hand against the dealer
+    :param strategies: (list(strategies.Strategy)) strategies to be compared
+    :param rounds: (int) number of rounds to be played
+    :param decks: (int) number of decks in each shoe
+    :param seed: (int) seed of the random number generator
+    :return: (list(tuple)) label of every strategy (see Strategy.label)
+    with its 'win', 'push' and 'loss' rates and 'edge' (see
+    threshold_sweep), best edge first
+    """
+    sweep = threshold_sweep(strategies, rounds, decks, seed)
+    return sorted(((strategy.label, sweep[strategy])
+                   for strategy in strategies),
+                  key=lambda entry: (-entry[1]["edge"], entry[0]))
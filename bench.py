@@ -0,0 +1,255 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+from blackjack import Game, players_per_deck
+from deck import Deck, Shoe
+from player import ComputerPlayer
+
+# Benchmark suite of the hot paths of the game, all played headless:
+# shuffling, dealing, scoring, bot decisions and full rounds, for shoes of
+# 1 to 8 decks (the number of decks follows the number of players, see
+# players_per_deck) and several table sizes. Results can be saved as a JSON
+# baseline and compared with a later run.
+default_decks = [1, 2, 4, 8]
+default_tables = [1, 6, 30]
+repeats = 3  # every benchmark keeps the best of several runs
+regression_threshold = 0.10  # slowdown reported as a regression
+
+
+def timed(function, operations):
+    """
+    This function times 'function', keeping the best of several runs
+    :param function: function performing 'operations' operations per call
+    :param operations: (int) number of operations per call
+    :return: (float) operations per second
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return operations / best
+
+
+def bench_shuffle(decks, operations):
+    """
+    This function measures Deck.shuffle
+    :param decks: (int) number of decks in the shoe
+    :param operations: (int) number of shuffles
+    :return: (float) shuffles per second
+    """
+    deck = Deck(decks)
+
+    def run():
+        for _ in range(operations):
+            deck.shuffle()
+    return timed(run, operations)
+
+
+def bench_deal_card(decks, operations):
+    """
+    This function measures Shoe.deal_card (the card is put back after
+    every deal)
+    :param decks: (int) number of decks in the shoe
+    :param operations: (int) number of cards dealt
+    :return: (float) cards dealt per second
+    """
+    shoe = Shoe(decks)
+
+    def run():
+        for _ in range(operations):
+            shoe.put_card(shoe.deal_card())
+    return timed(run, operations)
+
+
+def bench_update_score(decks, operations):
+    """
+    This function measures Player.update_score, four cards per hand
+    :param decks: (int) number of decks the cards are taken from
+    :param operations: (int) number of cards scored
+    :return: (float) cards scored per second
+    """
+    deck = Deck(decks)
+    player = ComputerPlayer("Bench", headless=True)
+    cards = [deck[index] for index in range(len(deck))]
+
+    def run():
+        for index in range(operations):
+            if index % 4 == 0:
+                player.clear_hand()
+            player.update_score(cards[index % len(cards)])
+    return timed(run, operations)
+
+
+def bench_decision(decks, operations):
+    """
+    This function measures the decision of a headless ComputerPlayer
+    :param decks: (int) unused, for a uniform signature
+    :param operations: (int) number of decisions
+    :return: (float) decisions per second
+    """
+    player = ComputerPlayer("Bench", headless=True)
+    player.score = 15
+
+    def run():
+        for _ in range(operations):
+            player.call()
+    return timed(run, operations)
+
+
+def bench_round(bots, operations):
+    """
+    This function measures full headless rounds (Game.play_round)
+    :param bots: (int) number of bots at the table
+    :param operations: (int) number of rounds
+    :return: (float) rounds per second
+    """
+    game = Game(0, bots, headless=True, rng=random.Random(0))
+    game.seat_players()
+
+    def run():
+        for _ in range(operations):
+            game.play_round()
+            game.reset_round()
+    return timed(run, operations)
+
+
+def round_allocations(bots, rounds):
+    """
+    This function measures the memory behaviour of full rounds
+    :param bots: (int) number of bots at the table
+    :param rounds: (int) number of rounds played
+    :return: (dict) net memory blocks kept and garbage collections of the
+    youngest generation, per 1000 rounds
+    """
+    game = Game(0, bots, headless=True, rng=random.Random(0))
+    game.seat_players()
+    game.play_round()
+    game.reset_round()
+    blocks = sys.getallocatedblocks()
+    collections = gc.get_stats()[0]["collections"]
+    for _ in range(rounds):
+        game.play_round()
+        game.reset_round()
+    return {"net_blocks_per_1k_rounds":
+            (sys.getallocatedblocks() - blocks) * 1000 / rounds,
+            "gc_per_1k_rounds":
+            (gc.get_stats()[0]["collections"] - collections) * 1000 / rounds}
+
+
+def run_suite(decks_list=default_decks, tables=default_tables, scale=1.0):
+    """
+    This function runs every benchmark
+    :param decks_list: (list(int)) shoe sizes, in decks
+    :param tables: (list(int)) table sizes, in bots
+    :param scale: (float) factor on the number of operations per benchmark
+    :return: (dict) ops/sec per benchmark name, and allocation figures
+    """
+    operations = max(1, int(20000 * scale))
+    rounds = max(1, int(2000 * scale))
+    results = {}
+    for decks in decks_list:
+        results["shuffle/{}d".format(decks)] = bench_shuffle(
+            decks, max(1, operations // (10 * decks)))
+        results["deal_card/{}d".format(decks)] = bench_deal_card(decks,
+                                                                 operations)
+        # the game adds a deck for every players_per_deck players
+        bots = (decks - 1) * players_per_deck + 1
+        results["round/{}d/{}p".format(decks, bots)] = bench_round(
+            bots, max(1, rounds // decks))
+    results["update_score"] = bench_update_score(1, operations * 5)
+    results["decision"] = bench_decision(1, operations * 5)
+    for bots in tables:
+        results["round/{}p".format(bots)] = bench_round(
+            bots, max(1, rounds * 6 // (bots + 6)))
+    allocations = {"round/{}p".format(bots): round_allocations(bots, rounds)
+                   for bots in tables}
+    return {"python": platform.python_version(), "ops_per_sec": results,
+            "allocations": allocations}
+
+
+def compare(results, baseline, threshold=regression_threshold):
+    """
+    This function compares ops/sec with a baseline
+    :param results: (dict) results of run_suite
+    :param baseline: (dict) earlier results of run_suite
+    :param threshold: (float) relative slowdown reported as a regression
+    :return: (list(tuple)) name, baseline, current, ratio and regression flag
+    of every benchmark present in both
+    """
+    rows = []
+    for name, current in results["ops_per_sec"].items():
+        before = baseline["ops_per_sec"].get(name)
+        if before:
+            ratio = current / before
+            rows.append((name, before, current, ratio,
+                         ratio < 1 - threshold))
+    return rows
+
+
+def report(results, rows=None):
+    """
+    This function prints the results of the suite
+    :param results: (dict) results of run_suite
+    :param rows: (list(tuple)) comparison with a baseline (see compare)
+    :return: None
+    """
+    print("{:<24}{:>16}".format("benchmark", "ops/sec"))
+    for name, ops in results["ops_per_sec"].items():
+        print("{:<24}{:>16,.0f}".format(name, ops))
+    print()
+    for name, figures in results["allocations"].items():
+        print("{:<24}net blocks/1k rounds {:>10.1f}   gc/1k rounds {:>8.1f}"
+              .format(name, figures["net_blocks_per_1k_rounds"],
+                      figures["gc_per_1k_rounds"]))
+    if rows:
+        print()
+        print("{:<24}{:>16}{:>16}{:>9}".format("benchmark", "baseline",
+                                               "current", "ratio"))
+        for name, before, current, ratio, regression in rows:
+            print("{:<24}{:>16,.0f}{:>16,.0f}{:>9.2f}{}".format(
+                name, before, current, ratio,
+                "  REGRESSION" if regression else ""))
+
+
+def main(arguments=None):
+    """
+    This function is the command line entry point of the benchmarks
+    :param arguments: (list(str)) command line arguments (sys.argv if None)
+    :return: (int) exit status, 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot paths of the blackjack game")
+    parser.add_argument("--decks", type=int, nargs="+",
+                        default=default_decks, help="shoe sizes, in decks")
+    parser.add_argument("--tables", type=int, nargs="+",
+                        default=default_tables, help="table sizes, in bots")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="factor on the number of operations")
+    parser.add_argument("--save", metavar="FILE",
+                        help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with a JSON baseline")
+    parser.add_argument("--threshold", type=float,
+                        default=regression_threshold,
+                        help="relative slowdown reported as a regression")
+    options = parser.parse_args(arguments)
+    results = run_suite(options.decks, options.tables, options.scale)
+    rows = None
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            rows = compare(results, json.load(baseline_file),
+                           options.threshold)
+    report(results, rows)
+    if options.save:
+        with open(options.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    return 1 if rows and any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
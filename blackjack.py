@@ -1,15 +1,25 @@
 import random
-from deck import Deck
-from player import HumanPlayer, ComputerPlayer, Dealer
+from deck import Shoe
+import events
+from renderer import Renderer
+from player import (HumanPlayer, ComputerPlayer, BasicStrategyPlayer, Dealer,
+                    prompt_name)
+from rules import classic
+from strategies import StrategyPlayer, decide_batch
 from tools import *
 
 print_space = 2  # spaces between printing players
 players_per_deck = 6  # number of players per deck
+penetration = 0.75  # share of the shoe dealt before reshuffling
+prompted_bots = 6  # bots of larger tables are seated without a name prompt
 
 
 class Game:
 
-    def __init__(self, human_players=1, computer_players=1):
+    def __init__(self, human_players=1, computer_players=1, headless=False,
+                 rng=None, bot_class=ComputerPlayer, pace=None,
+                 continuous_shuffle=False, rules=None, prompt=True,
+                 names=()):
         """
         This class contains the elements of the game. This function
         initialises the number of players in the game, their names and their
@@ -22,33 +32,99 @@ class Game:
         max_score = the score of the winner of the current round
         deck = Card deck (class Deck) used in the current game
         player_position = position of the player on the table relative to the dealer
+        seats = dictionary of the players seated at the table by id
+        seat_index = dictionary of the index of every player in 'table' by id
+        batched = players whose decisions are taken in batches by their
+        strategy plugins in headless rounds (see play_batched)
+        renderer = terminal renderer redrawing the table (class Renderer)
+        headless = whether the game runs without terminal I/O or delays (used
+        for simulations, only computer players can be seated)
+        rng = random number generator of the game, shared by the deck and the
+        players (the global one of the random module by default)
+        bot_class = class of the computer players (ComputerPlayer plays a
+        random threshold, BasicStrategyPlayer plays basic strategy)
+        log = event log of the game (see record_events)
+        results = results pipeline of the game (see record_results)
+        pace = pacing profile of the terminal game ('instant', 'fast' or
+        'cinematic', see pacing.py), None keeps the current one
+        continuous_shuffle = whether the discards go straight back into the
+        shoe (continuous shuffling machine) instead of waiting for the cut card
+        rules = rule variant of the game, compiled (see rules.py)
+        prompt = whether the player counts and names are asked for at the
+        start of a terminal game
+        names = names of the players, humans first (the missing ones are
+        named after their ids)
+        players = number of human and computer players the game started
+        with, restored for every new game (see new_game)
+        pool = players of the previous games by class, reused by the next
+        game instead of creating new ones
 
         :param human_players:
         :param computer_players:
+        :param headless:
+        :param rng:
+        :param bot_class:
+        :param pace:
+        :param continuous_shuffle:
+        :param rules: (rules.Rules) rule variant, the classic rules if None
+        :param prompt:
+        :param names:
         """
         self.humans = human_players
         self.bots = computer_players
-        clear_screen()
-        self.prompt_num_players()
+        self.headless = headless
+        if pace is not None:
+            scheduler.set_profile(pace)
+        self.rng = rng or random
+        self.bot_class = bot_class
+        self.continuous_shuffle = continuous_shuffle
+        self.rules = (rules or classic).compile()
+        self.prompt = prompt
+        self.names = list(names)
+        self.log = None
+        self.results = None
+        self.players = human_players, computer_players
+        self.pool = {}
+        if not headless:
+            clear_screen()
+        if not headless and prompt:
+            self.prompt_num_players()
         self.table = []
         self.winners = []
         self.max_score = 0
         self.deck = self.create_deck()
         self.player_position = {}
-        self.dealer = Dealer(self.deck)
-        clear_screen()
+        self.seats = {}
+        self.seat_index = {}
+        self.batched = []
+        self.renderer = Renderer(print_space)
+        self.dealer = Dealer(self.deck, headless, self.rules)
+        if not headless:
+            clear_screen()
 
     def create_deck(self):
         """
         This function creates a game deck based on the number of players in the
         game (to avoid card counting). With the present logic a new deck is
-        added for every 6 players
-        :return: a new deck object (class Deck)
+        added for every 6 players, unless the rules set more decks.
+        The discards are shuffled back in when the cut card is reached, or
+        continuously.
+        :return: a new deck object (class Shoe)
         """
-        temp_deck = Deck()
-        temp_deck._cards *= (
-                    ((self.humans + self.bots - 1) // players_per_deck) + 1)
-        return temp_deck
+        return Shoe(self.shoe_decks(self.humans + self.bots), self.rng,
+                    penetration, self.continuous_shuffle)
+
+    def shoe_decks(self, players):
+        """
+        This function returns the number of decks of the shoe for a table:
+        a deck for every 6 players, or the number set by the rules if it is
+        more (a table too large for the rules' shoe gets more decks, so a
+        round never runs out of cards)
+        :param players: (int) number of players, the dealer excluded
+        :return: (int) number of decks
+        """
+        return max(self.rules.decks or 0,
+                   (players - 1) // players_per_deck + 1)
 
     def show_table(self):
         """
@@ -59,59 +135,279 @@ class Game:
         for person in self.table:
             print(person, end='\n' * print_space)
 
+    def provision_deck(self):
+        """
+        This function adds decks to the shoe when players joined the table,
+        keeping a deck for every 6 players (or more if the rules set the
+        number of decks, see shoe_decks), and gives the basic strategy bots
+        the strategy of the shoe
+        :return: None
+        """
+        needed = self.shoe_decks(len(self.table) - 1)
+        if needed > self.deck.decks:
+            self.deck.add_decks(needed - self.deck.decks)
+        decks = self.deck.decks
+        for player in self.table:
+            if isinstance(player, BasicStrategyPlayer) and \
+                    player.decks != decks:
+                player.use_decks(decks)
+
+    def redraw(self, player=None):
+        """
+        This function redraws the players whose line changed since the last
+        redraw, in a single terminal write. The table ends 3 lines above the
+        cursor during the players' turns.
+        :param player: (class Player) the only player whose line may have
+        changed, None to compare the whole table
+        :return: None
+        """
+        scheduler.delay("redraw")
+        if player is None:
+            self.renderer.render_table(self.table, 3)
+        else:
+            self.renderer.render_line(self.seat_index[player.id],
+                                      repr(player), 3)
+
     def play(self):
         """
         This function starts the game. The dealer deals the cards for the
         first round, and upon user input cards are distributed eventually.
         After all player cards are dealt, dealer deals his own cards and
         subsequently the winner is announced. The user is prompted to play
-        another round in the end.
+        another round in the end. Rounds and new games are played in a loop,
+        so a long session does not grow the stack.
+        :return: None
+        """
+        while True:
+            clear_screen()
+            print("Welcome to Sud's Casino")
+            print("Let's play Blackjack")
+            print("Human players are marked with (h) and bots with (b)",
+                  end='\n\n')
+            if len(self.table) == 0:
+                self.seat_players()
+
+            self.show_table()
+            if validate_input(['s', 'e'],
+                              "Please press s to start or e to exit the game",
+                              " is not a valid input. Please press s to start "
+                              "or e to exit the game") == 'e':
+                self.exit_game()
+                return
+            self.play_terminal_round()
+            choice = self.prompt_another_round()
+            if choice == "exit":
+                self.exit_game()
+                return
+            if choice == "new":
+                self.new_game()
+
+    def play_terminal_round(self):
+        """
+        This function plays a round on the terminal: the dealer deals, every
+        player takes their turn with the table redrawn as they play, and the
+        winners are announced
         :return: None
         """
-        clear_screen()
-        print("Welcome to Sud's Casino")
-        print("Let's play Blackjack")
-        print("Human players are marked with (h) and bots with (b)", end='\n\n')
-        count1 = 0
-        count2 = 0
-        if len(self.table) == 0:
-            for count1 in range(self.humans):
-                self.table.append(HumanPlayer("Player" + str(count1 + 1)))
-                self.table[-1].id = count1
-            for count2 in range(self.bots):
-                self.table.append(
-                    ComputerPlayer("Player" + str(count1 + count2 + 2)))
-                self.table[-1].id = count1 + count2 + 1
-            random.shuffle(self.table)
-            self.table.append(self.dealer)
-            self.table[-1].id = count1 + count2 + 2
-        for position, player in enumerate(self.table[::-1]):
-            self.player_position[player.id] = position * print_space
-
-        self.show_table()
-        if validate_input(['s', 'e'],
-                          "Please press s to start or e to exit the game",
-                          " is not a valid input. Please press s to start or e "
-                          "to exit the game") == 'e':
-            self.exit_game()
-            return
         move_lines_up(len(self.table) * print_space)
+        self.deck.start_round()
+        scheduler.bots_only = not any(player.type == 'h'
+                                      for player in self.table)
+        scheduler.start_round()
+        if self.log is not None:
+            self.log.new_round()
         self.dealer.deal(self.table)
+        if self.rules.insurance:
+            self.dealer.offer_insurance(self.table)
+        dealer_blackjack = self.rules.peek and self.dealer.peek()
+        self.renderer.sync([repr(person) for person in self.table])
         for player in self.table:
             status = "hit"
             print("{}'s turn:".format(player.name))
             if player.type == "dealer":
                 player.flip_card_up()
-                overwrite_prev_line(player, self.player_position[player.id], 3)
+                self.redraw(player)
+            elif dealer_blackjack:
+                status = None
             if player.score == 21:
                 player.status = "Congrats you hit Blackjack 🎉 "
-                overwrite_prev_line(player, self.player_position[player.id], 3)
-            while player.score < 21 and status == "hit":
-                status = self.dealer.poll(player)
-                overwrite_prev_line(player, self.player_position[player.id], 3)
+                self.redraw(player)
+            while status is not None:
+                while player.score < 21 and status == "hit":
+                    status = self.dealer.poll(player)
+                    self.redraw(player)
+                status = self.dealer.next_hand(player)
+                if status is not None:
+                    self.redraw(player)
+            self.settle(player)
             clear_prev_lines(1)
         self.check_winner()
-        self.prompt_another_round()
+        if self.results is not None:
+            self.results.record_round(self)
+
+    def record_events(self, log):
+        """
+        This function records the events of every following round (deals,
+        hits, stays, flips, busts and winners) in an event log
+        :param log: (events.EventWriter) the event log, None to stop recording
+        :return: None
+        """
+        self.log = log
+        self.dealer.log = log
+
+    def record_results(self, results):
+        """
+        This function records the outcome of every player at the end of
+        every following round
+        :param results: (results.ResultWriter) the results pipeline, None to
+        stop recording
+        :return: None
+        """
+        self.results = results
+
+    def seat_players(self):
+        """
+        This function creates the players of the game, seats them at the
+        table in a random order and places the dealer at the end of the table.
+        Bots are only prompted for a name at small tables (see prompted_bots).
+        :return: None
+        """
+        count1 = 0
+        for count1 in range(self.humans):
+            name = self.player_name(count1)
+            self.table.append(
+                self.reuse_player(HumanPlayer, name, self.prompt) or
+                HumanPlayer(name, self.headless or not self.prompt))
+            self.table[-1].headless = self.headless
+            self.table[-1].id = count1
+        self.table.extend(self.create_bots(
+            self.bots, count1 + 1, self.prompt and self.bots <= prompted_bots))
+        for player in self.table:
+            player.rng = self.rng
+        self.rng.shuffle(self.table)
+        self.table.append(self.dealer)
+        self.table[-1].id = count1 + self.bots + 1
+        self.provision_deck()
+        self.index_seats()
+
+    def create_bots(self, count, first_id, prompt=False):
+        """
+        This function creates computer players in bulk, named after their ids
+        :param count: (int) number of bots to be created
+        :param first_id: (int) id of the first bot, the next ones follow
+        :param prompt: (bool) prompt for the name of every bot (unless the
+        game is headless)
+        :return: (list(class Player)) the new bots
+        """
+        bots = []
+        for player_id in range(first_id, first_id + count):
+            name = self.player_name(player_id)
+            bot = self.reuse_player(self.bot_class, name, prompt) or \
+                self.bot_class(name, self.headless or not prompt, self.rng)
+            bot.headless = self.headless
+            bot.id = player_id
+            bots.append(bot)
+        return bots
+
+    def player_name(self, player_id):
+        """
+        This function returns the name of a new player, taken from the
+        names given to the game or made from the player's id
+        :param player_id: (int) id of the player
+        :return: (str) name of the player
+        """
+        # ids start at 1 when there are no humans (see seat_players)
+        position = player_id if self.humans else player_id - 1
+        if position < len(self.names):
+            return self.names[position]
+        return "Player" + str(player_id + 1)
+
+    def index_seats(self):
+        """
+        This function rebuilds the indexes of the seats after players sat
+        down or left: the players by id, their index in the table and their
+        position relative to the dealer
+        :return: None
+        """
+        last = len(self.table) - 1
+        self.seats = {player.id: player for player in self.table}
+        self.seat_index = {player.id: index
+                           for index, player in enumerate(self.table)}
+        self.player_position = {player.id: (last - index) * print_space
+                                for index, player in enumerate(self.table)}
+        self.batched = [player for player in self.table
+                        if isinstance(player, StrategyPlayer)]
+
+    def add_players(self, players):
+        """
+        This function seats players in front of the dealer, between rounds,
+        adding decks to the shoe if needed
+        :param players: (list(class Player)) the players, with unique ids
+        :return: None
+        """
+        self.table[-1:-1] = players
+        for player in players:
+            if player.type == 'h':
+                self.humans += 1
+            else:
+                self.bots += 1
+        self.provision_deck()
+        self.index_seats()
+
+    def add_bots(self, count):
+        """
+        This function seats 'count' new bots at the table without any
+        prompt, for stress tests and tournaments with thousands of seats
+        :param count: (int) number of bots to be added
+        :return: (list(class Player)) the new bots
+        """
+        if len(self.table) == 0:
+            self.seat_players()
+        bots = self.create_bots(count, max(self.seats) + 1)
+        self.add_players(bots)
+        return bots
+
+    def remove_players(self, player_ids):
+        """
+        This function removes players from the table between rounds, in a
+        single pass over the table
+        :param player_ids: (set(int)) ids of the players leaving the table
+        :return: None
+        """
+        for player_id in player_ids:
+            if self.seats[player_id].type == 'h':
+                self.humans -= 1
+            else:
+                self.bots -= 1
+        self.table[:] = [player for player in self.table
+                         if player.id not in player_ids]
+        self.index_seats()
+
+    def settle(self, player):
+        """
+        This function counts the final score of a player in the winners of
+        the current round, once the player's turn is over
+        :param player: (class Player) player whose turn is over
+        :return: None
+        """
+        if self.max_score <= player.score <= 21:
+            if self.max_score < player.score:
+                self.winners.clear()
+            self.winners.append(player)
+            self.max_score = player.score
+
+    def find_winners(self):
+        """
+        This function returns the winners of the current round, which were
+        kept up to date as the players finished their turns (see settle),
+        without printing anything
+        :return: (list(class Player)) the winners of the current round
+        """
+        if self.log is not None:
+            for player in self.winners:
+                self.log.record(player.id, events.winner, events.no_card,
+                                player.score)
+        return self.winners
 
     def check_winner(self):
         """
@@ -119,12 +415,7 @@ class Game:
         and prints the result on the screen
         :return: None
         """
-        for player in self.table:
-            if self.max_score <= player.score <= 21:
-                if self.max_score < player.score:
-                    self.winners.clear()
-                self.winners.append(player)
-                self.max_score = player.score
+        self.find_winners()
         if len(self.winners) == 0:
             print("Unlucky day!! Nobody won this round ")
         else:
@@ -136,16 +427,12 @@ class Game:
 
     def prompt_another_round(self):
         """
-        This function prompts the user for another round and if the user
-        requests, initialises the game and starts it all over again.
-        :return: None
+        This function clears the table and prompts the user for another
+        round, with the same players or in a new game
+        :return: (str) 'same' to play on with the same players, 'new' for a
+        new game and 'exit' to leave
         """
-        for player in self.table:
-            self.dealer.collect(player)
-            player.status = ""
-            player.score = 0
-        self.max_score = 0
-        self.winners.clear()
+        self.reset_round()
         print("Do you want to play another round of Blackjack?")
         result = validate_input(['y', 'n'],
                                 "Please press y to start another round or n "
@@ -160,13 +447,175 @@ class Game:
                                     " is not a valid input. Please press y to "
                                     "continue with the same players or n to "
                                     "start a new game")
-            if result == 'y':
-                self.play()
-            else:
-                self.__init__()
-                self.play()
-        else:
-            self.exit_game()
+            return "same" if result == 'y' else "new"
+        return "exit"
+
+    def new_game(self):
+        """
+        This function starts a new game at the same table: the player counts
+        the game started with are restored (and prompted for again), the
+        shoe is refilled in place and the players of the previous game are
+        kept in a pool, to be reused by seat_players instead of creating new
+        players
+        :return: None
+        """
+        self.reset_round()
+        for player in self.table[:-1]:
+            self.pool.setdefault(type(player), []).append(player)
+        self.table.clear()
+        self.humans, self.bots = self.players
+        if not self.headless and self.prompt:
+            clear_screen()
+            self.prompt_num_players()
+        self.deck.reset(self.shoe_decks(self.humans + self.bots))
+        self.dealer.reset()
+        self.index_seats()
+
+    def reuse_player(self, player_class, name, prompt):
+        """
+        This function takes a player of a previous game out of the pool and
+        resets it for the new game
+        :param player_class: class of the player
+        :param name: (str) name of the player
+        :param prompt: (bool) prompt for the name of the player (unless the
+        game is headless)
+        :return: (class Player) the player, None if the pool has none left
+        """
+        pool = self.pool.get(player_class)
+        if not pool:
+            return None
+        player = pool.pop()
+        player.rng = self.rng
+        player.reset()
+        player.name = name
+        if prompt and not self.headless:
+            prompt_name(player)
+        return player
+
+    def reset_round(self):
+        """
+        This function collects the cards from every player on the table and
+        clears the scores and winners of the current round
+        :return: None
+        """
+        for player in self.table:
+            self.dealer.collect(player)
+            player.status = ""
+            player.clear_hand()
+        self.max_score = 0
+        self.winners.clear()
+
+    def play_round(self):
+        """
+        This function plays a single round without any terminal I/O or
+        delays, following the same rules as play(): the dealer deals, every
+        player is polled until they stay or reach 21 (on every hand after a
+        split) and the winners are determined. The cards stay on the table,
+        so that the round can be inspected: call reset_round() to collect
+        them before the next round.
+        :return: (list(class Player)) the winners of the round
+        """
+        if len(self.table) == 0:
+            self.seat_players()
+        dealer = self.dealer
+        rules = self.rules
+        self.deck.start_round()
+        if self.log is not None:
+            self.log.new_round()
+        dealer.deal(self.table)
+        if rules.insurance:
+            dealer.offer_insurance(self.table)
+        dealer_blackjack = rules.peek and dealer.peek()
+        if self.batched and not dealer_blackjack:
+            self.play_batched()
+        for player in self.table:
+            if player is dealer:
+                player.flip_card_up()
+            elif dealer_blackjack or isinstance(player, StrategyPlayer):
+                self.settle(player)
+                continue
+            status = "hit"
+            while status is not None:
+                while player.score < 21 and status == "hit":
+                    status = dealer.poll(player)
+                status = dealer.next_hand(player)
+            self.settle(player)
+        winners = list(self.find_winners())
+        if self.results is not None:
+            self.results.record_round(self)
+        return winners
+
+    def play_batched(self):
+        """
+        This function plays the turns of the strategy bots of a headless
+        round in passes: in every pass, each strategy takes the decisions of
+        all its bots still playing in a single call (see
+        strategies.decide_batch), then the dealer carries them out in seat
+        order. Split hands join the next pass.
+        :return: None
+        """
+        dealer = self.dealer
+        pending = [player for player in self.batched
+                   if self.next_decision(player, "hit")]
+        while pending:
+            for player in pending:
+                dealer.offer(player)
+            decisions = decide_batch(pending)
+            pending = [player for player, read in zip(pending, decisions)
+                       if self.next_decision(player,
+                                             dealer.respond(player, read))]
+
+    def next_decision(self, player, status):
+        """
+        This function moves a player on after a decision: to the next split
+        hand once the current one is over
+        :param player: (class Player) player who decided
+        :param status: (str) status returned by Dealer.respond
+        :return: (bool) True if the player has another decision to take
+        """
+        while status != "hit" or player.score >= 21:
+            status = self.dealer.next_hand(player)
+            if status is None:
+                return False
+        return True
+
+    def simulate(self, rounds, seed=None):
+        """
+        This function plays 'rounds' headless rounds back to back and
+        aggregates the results. The game must have been created with
+        headless=True and without human players.
+        :param rounds: (int) number of rounds to be played
+        :param seed: (int) seed for the random number generator, to make a
+        simulation reproducible
+        :return: (dict) aggregate results: number of 'rounds', 'wins' and
+        'busts' per player name and the number of rounds with 'no_winner'
+        """
+        if not self.headless or self.humans:
+            raise ValueError("Simulations need a headless game without "
+                             "human players")
+        if seed is not None:
+            self.rng = random.Random(seed)
+            self.deck = self.create_deck()
+            self.dealer.deck = self.deck
+            for player in self.table:
+                player.rng = self.rng
+        if len(self.table) == 0:
+            self.seat_players()
+        wins = dict.fromkeys([player.name for player in self.table], 0)
+        busts = dict.fromkeys(wins, 0)
+        no_winner = 0
+        for _ in range(rounds):
+            winners = self.play_round()
+            if not winners:
+                no_winner += 1
+            for player in winners:
+                wins[player.name] += 1
+            for player in self.table:
+                if player.score > 21:
+                    busts[player.name] += 1
+            self.reset_round()
+        return {"rounds": rounds, "wins": wins, "busts": busts,
+                "no_winner": no_winner}
 
     @staticmethod
     def exit_game():
@@ -177,7 +626,7 @@ class Game:
         """
         clear_screen()
         print("Hope to see you again soon! Thanks for playing 😊")
-        time.sleep(1.5)
+        scheduler.delay("exit")
         clear_screen()
 
     def prompt_num_players(self):
@@ -201,16 +650,16 @@ class Game:
                     isinstance(int(num_players), int)
                     num_players = int(num_players)
                     clear_prev_lines(2)
-                    time.sleep(0.5)
+                    scheduler.delay("input")
                     break
                 except ValueError:
                     clear_prev_lines(2)
-                    time.sleep(0.5)
+                    scheduler.delay("input")
                     num_players = input(
                         f"{num_players} is not a valid integer."
                         f" Please enter a valid integer.\n")
             self.humans += num_players
-            time.sleep(1)
+            scheduler.delay("prompt")
 
         result = validate_input(['y', 'n'],
                                 f"Do you want to add more computer players? "
@@ -225,16 +674,16 @@ class Game:
                     isinstance(int(num_players), int)
                     num_players = int(num_players)
                     clear_prev_lines(2)
-                    time.sleep(0.5)
+                    scheduler.delay("input")
                     break
                 except ValueError:
                     clear_prev_lines(2)
-                    time.sleep(0.5)
+                    scheduler.delay("input")
                     num_players = input(
                         f"{num_players} is not a valid integer."
                         f" Please enter a valid integer.\n")
             self.bots += num_players
-            time.sleep(1)
+            scheduler.delay("prompt")
         clear_prev_lines(1)
 
 
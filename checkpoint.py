@@ -0,0 +1,381 @@
+import random
+import struct
+import zlib
+from array import array
+from blackjack import Game
+from counting import Counter, CountingPlayer
+from deck import Deck, Shoe, card_views
+from player import HumanPlayer, ComputerPlayer, BasicStrategyPlayer
+from rules import Rules
+from strategy import basic_strategy
+from strategies import StrategyPlayer
+
+# Checkpoints of the full state of a game: the shoe (cards left in their
+# order, discards and reshuffle state), the random number generator and
+# every seat (cards, hand, score, threshold, bankroll, split hands...), and
+# the rule variant of the game. A snapshot is a compact binary payload,
+# appended to a checkpoint file as a frame with a length and a checksum, so a
+# game can checkpoint between rounds with a single write, and a frame torn by
+# a crash is simply ignored on restore.
+magic = b"BJCK"
+version = 3
+frame_header = struct.Struct("<4sBII")  # magic, version, length, crc32
+game_record = struct.Struct("<IIBBHH")  # humans, bots, flags, max score,
+# number of players, number of winners
+deck_record = struct.Struct("<BHIdBIII")  # kind, decks, size, penetration,
+# continuous, reshuffles, cards left, discards
+counter_record = struct.Struct("<iI")  # running count, cards seen
+player_record = struct.Struct("<IBBBB?bqqq?BB")  # id, class, score, hand,
+# strategy decks, have_Ace, threshold, bankroll, bet, insurance, surrendered,
+# name and status lengths (followed by the cards, the pending split hands
+# and the finished split hands)
+pending_record = struct.Struct("<Bq")  # card, bet of a split hand waiting
+finished_record = struct.Struct("<BBq?")  # hand, score, bet and surrendered
+# of a finished split hand (followed by its cards)
+rng_record = struct.Struct("<B625I?d")  # version, Mersenne Twister state,
+# whether a gauss value is pending, the pending value
+rules_record = struct.Struct("<BBBBBB")  # decks (0 for one every 6 players),
+# rule flags, max hands, blackjack payout numerator and denominator, number
+# of double totals (any_total for any) followed by the totals
+rule_flags = ("dealer_hits_soft_17", "double_down", "double_after_split",
+              "resplit_aces", "hit_split_aces", "surrender", "insurance",
+              "peek")  # bit of every flag, in order
+any_total = 255
+has_counter, headless_flag, continuous_flag, module_rng = 1, 2, 4, 8
+player_classes = [HumanPlayer, ComputerPlayer, BasicStrategyPlayer,
+                  CountingPlayer, StrategyPlayer]  # strategy bots are
+# restored with the threshold strategy, plugins are not part of a snapshot
+dealer_class = 255
+face_up = 0x80  # card byte flag, the low bits hold the card code
+
+
+def pack_text(text):
+    """
+    This function encodes a short text for a snapshot
+    :param text: (str) text of at most 255 bytes once encoded
+    :return: (bytes) UTF-8 encoding of the text
+    """
+    return text.encode()[:255]
+
+
+def pack_rng(rng):
+    """
+    This function encodes the state of a random number generator
+    :param rng: random module or random.Random
+    :return: (bytes) the encoded state
+    """
+    state_version, state, gauss = rng.getstate()
+    return rng_record.pack(state_version, *state, gauss is not None,
+                           gauss or 0.0)
+
+
+def unpack_rng(data, offset):
+    """
+    This function decodes the state of a random number generator
+    :param data: (bytes) snapshot
+    :param offset: (int) position of the state in the snapshot
+    :return: (tuple) state for random.Random.setstate
+    """
+    fields = rng_record.unpack_from(data, offset)
+    return fields[0], fields[1:626], fields[627] if fields[626] else None
+
+
+def pack_rules(rules):
+    """
+    This function encodes a rule variant
+    :param rules: (rules.Rules) the variant
+    :return: (bytes) the encoded variant
+    """
+    flags = 0
+    for bit, flag in enumerate(rule_flags):
+        if getattr(rules, flag):
+            flags |= 1 << bit
+    totals = rules.double_totals
+    return rules_record.pack(rules.decks or 0, flags, rules.max_hands,
+                             *rules.blackjack_pays,
+                             any_total if totals is None else len(totals)) + \
+        bytes(totals or ())
+
+
+def unpack_rules(data, offset):
+    """
+    This function decodes a rule variant
+    :param data: (bytes) snapshot
+    :param offset: (int) position of the variant in the snapshot
+    :return: (tuple) the variant (rules.Rules) and its size in bytes
+    """
+    decks, flags, max_hands, numerator, denominator, count = \
+        rules_record.unpack_from(data, offset)
+    offset += rules_record.size
+    totals = None
+    if count != any_total:
+        totals = tuple(data[offset:offset + count])
+    rules = Rules(decks=decks or None, double_totals=totals,
+                  max_hands=max_hands,
+                  blackjack_pays=(numerator, denominator),
+                  **{flag: bool(flags >> bit & 1)
+                     for bit, flag in enumerate(rule_flags)})
+    return rules, rules_record.size + (count if totals else 0)
+
+
+def pack_cards(cards):
+    """
+    This function encodes the cards of a hand
+    :param cards: (list(Card)) the cards
+    :return: (bytes) number of cards followed by the card bytes
+    """
+    return bytes([len(cards)] + [card.code | (face_up if card.up else 0)
+                                 for card in cards])
+
+
+def unpack_cards(data, offset):
+    """
+    This function decodes the cards of a hand
+    :param data: (bytes) snapshot
+    :param offset: (int) position of the cards in the snapshot
+    :return: (tuple) the cards (list(Card)) and the position after them
+    """
+    count = data[offset]
+    cards = [card_views[card & ~face_up][bool(card & face_up)]
+             for card in data[offset + 1:offset + 1 + count]]
+    return cards, offset + 1 + count
+
+
+def pack_player(player, dealer):
+    """
+    This function encodes a seat of the table
+    :param player: (class Player) the player
+    :param dealer: (class Dealer) the dealer of the table
+    :return: (bytes) the encoded player
+    """
+    name = pack_text(player.name)
+    status = pack_text(player.status)
+    kind = dealer_class if player is dealer else \
+        player_classes.index(type(player))
+    threshold = getattr(player, "threshold", -1)
+    record = player_record.pack(player.id, kind, player.score, player.hand,
+                                getattr(player, "decks", 0), player.have_Ace,
+                                threshold, int(player.bankroll), player.bet,
+                                player.insurance, player.surrendered,
+                                len(name), len(status))
+    parts = [record, name, status, pack_cards(player.cards),
+             bytes([len(player.pending)])]
+    parts.extend(pending_record.pack(card.code, bet)
+                 for card, bet in player.pending)
+    parts.append(bytes([len(player.finished)]))
+    for cards, hand, score, bet, gave_up in player.finished:
+        parts.append(finished_record.pack(hand, score, bet, gave_up))
+        parts.append(pack_cards(cards))
+    return b"".join(parts)
+
+
+def snapshot(game):
+    """
+    This function takes a snapshot of the full state of a game
+    :param game: (class Game) the game
+    :return: (bytes) the snapshot
+    """
+    deck = game.deck
+    shoe = isinstance(deck, Shoe)
+    flags = ((has_counter if deck.counter is not None else 0) |
+             (headless_flag if game.headless else 0) |
+             (continuous_flag if game.continuous_shuffle else 0) |
+             (module_rng if game.rng is random else 0))
+    discards = deck.discards if shoe else array('B')
+    parts = [game_record.pack(game.humans, game.bots, flags, game.max_score,
+                              len(game.table), len(game.winners)),
+             pack_rng(game.rng),
+             pack_rules(game.rules.variant),
+             deck_record.pack(shoe, deck.decks,
+                              deck.size if shoe else len(deck),
+                              deck.penetration if shoe else 0.0,
+                              deck.continuous if shoe else False,
+                              deck.reshuffles if shoe else 0,
+                              len(deck._cards), len(discards)),
+             deck._cards.tobytes(), discards.tobytes()]
+    if deck.counter is not None:
+        parts.append(counter_record.pack(deck.counter.running,
+                                         deck.counter.seen))
+    parts.extend(pack_player(player, game.dealer) for player in game.table)
+    parts.append(struct.pack("<{}I".format(len(game.winners)),
+                             *[player.id for player in game.winners]))
+    return b"".join(parts)
+
+
+def restore(data):
+    """
+    This function rebuilds a game from a snapshot, without any prompt. The
+    event log and the terminal state are not part of a snapshot.
+    :param data: (bytes) snapshot taken by snapshot()
+    :return: (class Game) the game, in the state of the snapshot
+    """
+    humans, bots, flags, max_score, players, winners = \
+        game_record.unpack_from(data)
+    offset = game_record.size
+    rng = random if flags & module_rng else random.Random()
+    rng_state = unpack_rng(data, offset)
+    offset += rng_record.size
+    rules, size = unpack_rules(data, offset)
+    offset += size
+    game = Game(humans, bots, headless=True, rng=rng,
+                continuous_shuffle=bool(flags & continuous_flag), rules=rules)
+    (shoe, decks, size, penetration, continuous, reshuffles, cards,
+     discards) = deck_record.unpack_from(data, offset)
+    offset += deck_record.size
+    if shoe:
+        deck = Shoe(decks, rng, penetration, bool(continuous))
+        deck.size = size
+        deck.reshuffles = reshuffles
+    else:
+        deck = Deck(decks, rng)
+    deck._cards = array('B', data[offset:offset + cards])
+    offset += cards
+    if shoe:
+        deck.discards = array('B', data[offset:offset + discards])
+    offset += discards
+    if flags & has_counter:
+        deck.counter = Counter(deck)
+        deck.counter.running, deck.counter.seen = \
+            counter_record.unpack_from(data, offset)
+        offset += counter_record.size
+    game.deck = game.dealer.deck = deck
+    headless = bool(flags & headless_flag)
+    game.headless = game.dealer.headless = headless
+    for _ in range(players):
+        (player_id, kind, score, hand, strategy_decks, have_ace, threshold,
+         bankroll, bet, insurance, gave_up, name_length, status_length) = \
+            player_record.unpack_from(data, offset)
+        offset += player_record.size
+        name = data[offset:offset + name_length].decode(errors="ignore")
+        offset += name_length
+        status = data[offset:offset + status_length].decode(errors="ignore")
+        offset += status_length
+        cards, offset = unpack_cards(data, offset)
+        pending = []
+        count = data[offset]
+        offset += 1
+        for _ in range(count):
+            card, pending_bet = pending_record.unpack_from(data, offset)
+            offset += pending_record.size
+            pending.append((card_views[card][True], pending_bet))
+        finished = []
+        count = data[offset]
+        offset += 1
+        for _ in range(count):
+            finished_hand = finished_record.unpack_from(data, offset)
+            finished_cards, offset = unpack_cards(
+                data, offset + finished_record.size)
+            finished.append((finished_cards, *finished_hand))
+        if kind == dealer_class:
+            player = game.dealer
+        elif player_classes[kind] is HumanPlayer:
+            player = HumanPlayer(name, True)
+        else:
+            player = player_classes[kind](name, True, rng)
+            player.threshold = threshold
+            if strategy_decks:
+                player.decks = strategy_decks
+                player.strategy = basic_strategy(strategy_decks)
+            if isinstance(player, CountingPlayer):
+                player.counter = deck.counter
+            game.bot_class = type(player)
+        player.id = player_id
+        player.name = name
+        player.status = status
+        player.headless = headless
+        player.rng = rng
+        player.score = score
+        player.hand = hand
+        player.have_Ace = have_ace
+        player.bankroll = bankroll
+        player.bet = bet
+        player.insurance = insurance
+        player.surrendered = gave_up
+        player.cards = cards
+        player.pending = pending
+        player.finished = finished
+        player.hands = 1 + len(pending) + len(finished)
+        game.table.append(player)
+    dealer = game.dealer
+    if dealer.cards:
+        for player in game.table[:-1]:
+            player.upcard = dealer.cards[0]
+    game.index_seats()
+    game.max_score = max_score
+    winner_ids = struct.unpack_from("<{}I".format(winners), data, offset)
+    game.winners = [game.seats[player_id] for player_id in winner_ids]
+    rng.setstate(rng_state)
+    return game
+
+
+class Checkpoint:
+
+    def __init__(self, path):
+        """
+        Class Checkpoint - appends snapshots of a game to a checkpoint file,
+        one frame per snapshot
+        :param path: (str) path of the checkpoint file (appended to if it
+        exists)
+        """
+        self._file = open(path, "ab")
+
+    def save(self, game):
+        """
+        This method appends a snapshot of the game, in a single write
+        :param game: (class Game) the game, preferably between two rounds
+        :return: (int) size of the frame in bytes
+        """
+        payload = snapshot(game)
+        frame = frame_header.pack(magic, version, len(payload),
+                                  zlib.crc32(payload)) + payload
+        self._file.write(frame)
+        self._file.flush()
+        return len(frame)
+
+    def close(self):
+        """
+        This method closes the checkpoint file
+        :return: None
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_frames(path):
+    """
+    This function reads the snapshots of a checkpoint file, stopping at the
+    first incomplete or corrupted frame
+    :param path: (str) path of the checkpoint file
+    :return: generator of the snapshots (bytes), oldest first
+    """
+    with open(path, "rb") as checkpoint_file:
+        data = checkpoint_file.read()
+    offset = 0
+    while offset + frame_header.size <= len(data):
+        frame_magic, frame_version, length, crc = \
+            frame_header.unpack_from(data, offset)
+        start = offset + frame_header.size
+        payload = data[start:start + length]
+        if (frame_magic != magic or frame_version != version or
+                len(payload) < length or zlib.crc32(payload) != crc):
+            return
+        yield payload
+        offset = start + length
+
+
+def resume(path):
+    """
+    This function rebuilds a game from the last complete snapshot of a
+    checkpoint file
+    :param path: (str) path of the checkpoint file
+    :return: (class Game) the game, None if the file holds no snapshot
+    """
+    last = None
+    for last in read_frames(path):
+        pass
+    return None if last is None else restore(last)
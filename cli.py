@@ -0,0 +1,331 @@
+import argparse
+import json
+import sys
+
+# Command line entry point: python3 cli.py <command> [options]
+#   play       terminal game, players and names given as options (no prompts)
+#   simulate   headless rounds of bots, results printed as JSON
+#   bench      benchmark suite (see bench.py)
+#   replay     events of a binary event log (see events.py)
+# Options can also come from a JSON or TOML config file (--config), whose
+# top level keys apply to every command and whose tables/objects named after
+# a command apply to that command only, with the command line taking
+# precedence. Game modules are only imported by the command that needs them,
+# so a headless run starts without loading the terminal or asyncio modules.
+bot_classes = {"threshold": ("player", "ComputerPlayer"),
+               "basic": ("player", "BasicStrategyPlayer"),
+               "counting": ("counting", "CountingPlayer"),
+               "strategy": ("strategies", "StrategyPlayer")}
+
+
+def load_config(path):
+    """
+    This function reads a config file
+    :param path: (str) path of a JSON or TOML (.toml) file
+    :return: (dict) options by name
+    """
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as config_file:
+            return tomllib.load(config_file)
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+def bot_class(name):
+    """
+    This function imports the class of a kind of bot
+    :param name: (str) 'threshold', 'basic', 'counting' or 'strategy'
+    :return: class of the bots
+    """
+    import importlib
+    module, class_name = bot_classes[name]
+    return getattr(importlib.import_module(module), class_name)
+
+
+def bot_kind(options):
+    """
+    This function returns the kind of bots chosen on the command line
+    :param options: (argparse.Namespace) options with 'bot' and 'strategy'
+    :return: (str) kind of bots, 'strategy' when a strategy is given
+    """
+    return "strategy" if options.strategy else options.bot
+
+
+def game_rules(options):
+    """
+    This function builds the rules chosen on the command line
+    :param options: (argparse.Namespace) options with 'rules' (the name of a
+    rule set) and 'decks'
+    :return: (rules.Rules) the rules
+    """
+    from rules import Rules, rule_sets
+    settings = dict(vars(rule_sets[options.rules]))
+    if options.decks:
+        settings["decks"] = options.decks
+    return Rules(**settings)
+
+
+def seat_strategy_bots(game, options):
+    """
+    This function seats the players of a game and gives the strategy chosen
+    on the command line to its strategy bots
+    :param game: (class Game) game whose bots were created as
+    StrategyPlayer (see bot_class)
+    :param options: (argparse.Namespace) options with 'strategy', the name
+    of the strategy followed by its arguments
+    :return: None
+    """
+    from strategies import shared_strategy
+    strategy = shared_strategy(*options.strategy)
+    if len(game.table) == 0:
+        game.seat_players()
+    for player in game.batched:
+        player.strategy = strategy
+
+
+def check_strategy(options, parser):
+    """
+    This function checks the strategy chosen on the command line by
+    creating it (it is shared with the bots, see seat_strategy_bots), and
+    exits with a usage error if it cannot be created
+    :param options: (argparse.Namespace) options with 'strategy', the name
+    of the strategy followed by its arguments
+    :param parser: (argparse.ArgumentParser) parser of the command
+    :return: None
+    """
+    from strategies import registry, shared_strategy
+    name = options.strategy[0]
+    if name not in registry:
+        parser.error("unknown strategy {} (choose from {})".format(
+            name, ", ".join(sorted(registry))))
+    try:
+        shared_strategy(*options.strategy)
+    except (TypeError, ValueError) as error:
+        parser.error("invalid arguments for strategy {}: {}".format(
+            name, error))
+
+
+def add_game_options(parser):
+    """
+    This function adds the options shared by the commands playing games
+    :param parser: (argparse.ArgumentParser) parser of the command
+    :return: None
+    """
+    from rules import rule_sets  # lookup tables only, no game state
+    parser.add_argument("--bots", type=int, default=1,
+                        help="number of computer players")
+    parser.add_argument("--bot", choices=sorted(bot_classes),
+                        default="threshold", help="kind of computer players")
+    parser.add_argument("--strategy", nargs="+", metavar=("NAME", "ARGUMENT"),
+                        help="strategy plugin of the bots and its arguments "
+                             "(see strategies.py), implies --bot strategy")
+    parser.add_argument("--rules", default="classic",
+                        choices=sorted(rule_sets), help="rule set")
+    parser.add_argument("--decks", type=int,
+                        help="number of decks (one per 6 players by default)")
+    parser.add_argument("--continuous", action="store_true",
+                        help="use a continuous shuffling machine")
+    parser.add_argument("--names", nargs="+", default=[],
+                        help="names of the players, humans first")
+    parser.add_argument("--seed", type=int, help="random seed")
+
+
+def play(options):
+    """
+    This function starts a terminal game
+    :param options: (argparse.Namespace) options of the command
+    :return: (int) exit status
+    """
+    import random
+    from blackjack import Game
+    game = Game(options.humans, options.bots,
+                rng=None if options.seed is None else
+                random.Random(options.seed),
+                bot_class=bot_class(bot_kind(options)), pace=options.pace,
+                continuous_shuffle=options.continuous,
+                rules=game_rules(options), prompt=options.prompt,
+                names=options.names)
+    if options.strategy:
+        seat_strategy_bots(game, options)
+    game.play()
+    return 0
+
+
+def simulate(options):
+    """
+    This function plays headless rounds and prints the results as JSON
+    :param options: (argparse.Namespace) options of the command
+    :return: (int) exit status
+    """
+    if options.workers and options.workers > 1:
+        from parallel import simulate_parallel
+        if (options.bot != "threshold" or options.strategy or
+                options.rules != "classic"):
+            print("--workers only supports threshold bots and the classic "
+                  "rules", file=sys.stderr)
+            return 2
+        results = simulate_parallel(options.rounds, options.bots,
+                                    options.seed or 0, options.workers)
+        print(json.dumps(results, indent=2))
+        return 0
+    import random
+    from blackjack import Game
+    if options.resume:
+        from checkpoint import resume
+        game = resume(options.resume)
+    else:
+        game = Game(0, options.bots, headless=True,
+                    rng=None if options.seed is None else
+                    random.Random(options.seed),
+                    bot_class=bot_class(bot_kind(options)),
+                    continuous_shuffle=options.continuous,
+                    rules=game_rules(options), names=options.names)
+    if options.strategy:
+        seat_strategy_bots(game, options)
+    log = writer = None
+    if options.log:
+        from events import EventWriter
+        log = EventWriter(options.log)
+        game.record_events(log)
+    if options.results:
+        from results import ResultWriter
+        writer = ResultWriter(options.results, file_format=options.format)
+        game.record_results(writer)
+    try:
+        results = game.simulate(options.rounds,
+                                None if options.resume else options.seed)
+    finally:
+        if log is not None:
+            log.close()
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        results["statistics"] = writer.summary()
+    if options.checkpoint:
+        from checkpoint import Checkpoint
+        with Checkpoint(options.checkpoint) as checkpoint:
+            checkpoint.save(game)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def bench(options):
+    """
+    This function runs the benchmark suite
+    :param options: (argparse.Namespace) options of the command, the
+    benchmark options ('arguments') are passed on to bench.main
+    :return: (int) exit status of the benchmarks
+    """
+    import bench
+    return bench.main(options.arguments)
+
+
+def replay(options):
+    """
+    This function prints the events of an event log, round by round
+    :param options: (argparse.Namespace) options of the command
+    :return: (int) exit status
+    """
+    from events import replay as replay_events, describe, event_names
+    kinds = None
+    if options.kinds:
+        codes = {name: kind for kind, name in event_names.items()}
+        kinds = {codes[name] for name in options.kinds}
+    for round_number, events in replay_events(
+            options.file, kinds=kinds,
+            players=set(options.players) if options.players else None,
+            rounds=set(options.rounds) if options.rounds else None):
+        for event in events:
+            print(describe(event))
+    return 0
+
+
+def build_parser():
+    """
+    This function builds the parser of the command line
+    :return: (tuple) the parser (argparse.ArgumentParser) and the parsers of
+    the commands by name
+    """
+    from events import event_names  # small module, no game state
+    parser = argparse.ArgumentParser(
+        description="Terminal blackjack and headless blackjack simulations")
+    parser.add_argument("--config", metavar="FILE",
+                        help="JSON or TOML file with default options")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play_parser = commands.add_parser("play", help="play in the terminal")
+    play_parser.add_argument("--humans", type=int, default=1,
+                             help="number of human players")
+    play_parser.add_argument("--pace", default="cinematic",
+                             choices=["instant", "fast", "cinematic"],
+                             help="pace of the animations")
+    play_parser.add_argument("--prompt", action="store_true",
+                             help="ask for the player counts and names")
+    add_game_options(play_parser)
+    play_parser.set_defaults(function=play)
+    simulate_parser = commands.add_parser("simulate",
+                                          help="play headless rounds")
+    add_game_options(simulate_parser)
+    simulate_parser.add_argument("--rounds", type=int, default=10000,
+                                 help="number of rounds")
+    simulate_parser.add_argument("--workers", type=int,
+                                 help="worker processes (threshold bots and "
+                                      "classic rules only)")
+    simulate_parser.add_argument("--log", metavar="FILE",
+                                 help="record the events in a binary log")
+    simulate_parser.add_argument("--results", metavar="DIRECTORY",
+                                 help="stream the outcome of every hand")
+    simulate_parser.add_argument("--format", choices=["csv", "npy"],
+                                 default="csv", help="format of the results")
+    simulate_parser.add_argument("--checkpoint", metavar="FILE",
+                                 help="save the game at the end")
+    simulate_parser.add_argument("--resume", metavar="FILE",
+                                 help="go on with a saved game")
+    simulate_parser.set_defaults(function=simulate)
+    bench_parser = commands.add_parser(
+        "bench", help="run the benchmarks (options of bench.py)")
+    bench_parser.set_defaults(function=bench)
+    replay_parser = commands.add_parser("replay",
+                                        help="print an event log")
+    replay_parser.add_argument("file", help="event log")
+    replay_parser.add_argument("--rounds", type=int, nargs="+",
+                               help="rounds to print")
+    replay_parser.add_argument("--players", type=int, nargs="+",
+                               help="ids of the players to print")
+    replay_parser.add_argument("--kinds", nargs="+",
+                               choices=list(event_names.values()),
+                               metavar="KIND",
+                               help="kinds of events to print ({})".format(
+                                   ", ".join(event_names.values())))
+    replay_parser.set_defaults(function=replay)
+    return parser, commands.choices
+
+
+def main(arguments=None):
+    """
+    This function is the command line entry point
+    :param arguments: (list(str)) command line arguments (sys.argv if None)
+    :return: (int) exit status
+    """
+    parser, command_parsers = build_parser()
+    known, _ = parser.parse_known_args(arguments)
+    if known.config:
+        config = load_config(known.config)
+        shared = {key.replace("-", "_"): value for key, value in
+                  config.items() if not isinstance(value, dict)}
+        for name, command_parser in command_parsers.items():
+            command_parser.set_defaults(**shared)
+            command_parser.set_defaults(**{
+                key.replace("-", "_"): value
+                for key, value in config.get(name, {}).items()})
+    options, extra = parser.parse_known_args(arguments)
+    if extra and options.command != "bench":
+        parser.error("unrecognized arguments: " + " ".join(extra))
+    options.arguments = extra
+    if getattr(options, "strategy", None):
+        check_strategy(options, command_parsers[options.command])
+    return options.function(options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
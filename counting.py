@@ -0,0 +1,176 @@
+import random
+from blackjack import Game, penetration
+from deck import ranks, card_ranks, cards_per_deck, Shoe
+from player import ComputerPlayer
+from rules import can_hit
+from tournament import payout
+
+# Hi-Lo card counting. Low cards (2 to 6) count +1, high cards (10s and
+# aces) count -1 and the others 0, so a positive count means the cards left
+# in the shoe are rich in high cards, which favours the players. The counter
+# is attached to a deck (Deck.counter) and sees every card dealt face up,
+# plus the dealer's hole card when it is flipped, with one table lookup per
+# card. Decks without a counter skip the hook with a single None check.
+rank_counts = {"2": 1, "3": 1, "4": 1, "5": 1, "6": 1, "7": 0, "8": 0,
+               "9": 0, "10": -1, "J": -1, "Q": -1, "K": -1, "A": -1}
+hilo_values = tuple(rank_counts[ranks[rank]] for rank in card_ranks)
+bet_spread = 8  # largest bet of a counting bot, in minimum bets
+edge_unit = 2  # minimum bet when measuring edges, so that 3:2 pays in chips
+
+
+class Counter:
+
+    def __init__(self, deck):
+        """
+        Class Counter - Hi-Lo running count of the cards seen since the last
+        shuffle. Attributes:
+        deck = (class Deck) the deck whose cards are counted
+        running = (int) running count
+        seen = (int) number of cards counted since the last shuffle
+        :param deck: (class Deck) the deck whose cards are counted
+        """
+        self.deck = deck
+        self.running = 0
+        self.seen = 0
+
+    def see(self, code):
+        """
+        This method counts a card
+        :param code: (int) code of the card seen
+        :return: None
+        """
+        self.running += hilo_values[code]
+        self.seen += 1
+
+    def unsee(self, cards):
+        """
+        This method takes back the count of cards returned to the shoe
+        (continuous shuffling machine)
+        :param cards: (list(Card)) cards returned to the shoe
+        :return: None
+        """
+        for card in cards:
+            self.running -= hilo_values[card.code]
+        self.seen -= len(cards)
+
+    def reset(self):
+        """
+        This method restarts the count after a shuffle
+        :return: None
+        """
+        self.running = 0
+        self.seen = 0
+
+    @property
+    def true_count(self):
+        """
+        The running count per deck left in the shoe
+        :return: (float) true count
+        """
+        return self.running * cards_per_deck / max(len(self.deck), 1)
+
+
+def attach(game):
+    """
+    This function attaches a counter to the shoe of a game, and gives it to
+    the counting bots seated at the table
+    :param game: (class Game) game whose cards are counted
+    :return: (class Counter) the counter
+    """
+    counter = Counter(game.deck)
+    game.deck.counter = counter
+    for player in game.table:
+        if isinstance(player, CountingPlayer):
+            player.counter = counter
+    return counter
+
+
+class CountingPlayer(ComputerPlayer):
+    def __init__(self, name, headless=False, rng=random, counter=None):
+        """
+        This class creates a bot that counts cards: it stands on lower
+        scores when the shoe is rich in high cards, hits more when it is
+        poor, and bets more when the count is in its favour
+        counter = (class Counter) the counter of the table (see attach)
+        :param name: (str) default name assigned by the game
+        :param headless: (bool) skip the name prompt and the simulated
+        thinking delays if True
+        :param rng: (random.Random) random number generator of the bot
+        :param counter: (class Counter) the counter of the table
+        """
+        super().__init__(name, headless, rng)
+        self.counter = counter
+
+    def decide(self):
+        """
+        This method moves the bot's threshold by one point for every two
+        points of true count (after the actions of the rule variants, see
+        ComputerPlayer.variant_decision)
+        :return: (str) Decision of the computer player (hit ('h) or stay ('s'))
+        """
+        if self.actions & ~can_hit:
+            decision = self.variant_decision()
+            if decision:
+                return decision
+        threshold = self.threshold
+        if self.counter is not None:
+            threshold -= int(self.counter.true_count / 2)
+        return 'h' if self.score < threshold else 's'
+
+    def insure(self):
+        """
+        This method takes insurance when the shoe is rich in tens, from a
+        true count of 3
+        :return: (int) chips staked on insurance
+        """
+        if self.counter is not None and self.counter.true_count >= 3:
+            return self.bet // 2
+        return 0
+
+    def wager(self, minimum):
+        """
+        This method bets one minimum bet more for every point of true count
+        above 1, up to bet_spread minimum bets
+        :param minimum: (int) minimum bet of the table
+        :return: (int) the bet
+        """
+        units = 1
+        if self.counter is not None:
+            units = min(bet_spread, max(1, int(self.counter.true_count)))
+        self.bet = min(self.bankroll, units * minimum)
+        return self.bet
+
+
+def measure_edge(rounds, decks=1, bot_class=CountingPlayer,
+                 computer_players=1, seed=0, continuous=False):
+    """
+    This function measures the edge of bots against the dealer over many
+    headless rounds with bets, for a given number of decks
+    :param rounds: (int) number of rounds to be played
+    :param decks: (int) number of decks in the shoe
+    :param bot_class: class of the bots (CountingPlayer by default)
+    :param computer_players: (int) number of bots at the table
+    :param seed: (int) seed of the simulation
+    :param continuous: (bool) use a continuous shuffling machine
+    :return: (dict) chips 'wagered' and 'won' by the bots, and their
+    'edge' (won per chip wagered)
+    """
+    game = Game(0, computer_players, headless=True,
+                rng=random.Random(seed), bot_class=bot_class)
+    game.deck = game.dealer.deck = Shoe(decks, game.rng, penetration,
+                                        continuous)
+    game.seat_players()
+    attach(game)
+    players = game.table[:-1]
+    for player in players:
+        player.bankroll = float("inf")
+    wagered = won = 0
+    for _ in range(rounds):
+        for player in players:
+            wagered += player.wager(edge_unit)
+        game.play_round()
+        for player in players:
+            won += payout(player, game.dealer)
+        game.reset_round()
+    return {"rounds": rounds, "wagered": wagered, "won": won,
+            "edge": won / wagered if wagered else 0.0}
@@ -0,0 +1,141 @@
+from functools import lru_cache
+from deck import Deck, card_ranks, ranks
+from hand import (empty_hand, num_states, num_ranks, max_count, transitions,
+                  hand_totals, hand_bust, hand_state, decode_state)
+
+# Exact distribution of the dealer's final hand for a given shoe composition.
+# The shoe is described by a tuple with the number of cards of each value
+# class: 2 to 9, ten-valued cards (10, J, Q, K) and aces. The dealer draws
+# until the score reaches 17 (see Dealer.decide) and the results of every
+# (hand state, composition) pair are kept in a bounded LRU cache, so
+# overlapping queries are answered from the cache.
+dealer_threshold = 17
+cache_size = 1 << 18  # maximum number of cached (state, composition) entries
+outcome_names = (17, 18, 19, 20, 21, "bust")
+num_classes = 10
+
+# value class of every rank index and a rank index representing each class
+rank_classes = tuple(min(rank, 8) if ranks[rank] != "A" else 9
+                     for rank in range(num_ranks))
+class_ranks = tuple(rank_classes.index(value_class)
+                    for value_class in range(num_classes))
+
+
+def shoe_counts(cards):
+    """
+    This function counts the cards of a shoe by value class
+    :param cards: (Deck or iterable(int)) deck, or card codes
+    :return: (tuple(int)) number of cards of each value class
+    """
+    codes = cards._cards if isinstance(cards, Deck) else cards
+    counts = [0] * num_classes
+    for code in codes:
+        counts[rank_classes[card_ranks[code]]] += 1
+    return tuple(counts)
+
+
+def full_shoe(decks=1):
+    """
+    This function returns the composition of a full shoe
+    :param decks: (int) number of decks in the shoe
+    :return: (tuple(int)) number of cards of each value class
+    """
+    return (4 * decks,) * 8 + (16 * decks, 4 * decks)
+
+
+def remove_card(counts, value_class):
+    """
+    This function removes a card from a shoe composition
+    :param counts: (tuple(int)) number of cards of each value class
+    :param value_class: (int) value class of the card removed
+    :return: (tuple(int)) the new composition
+    """
+    if not counts[value_class]:
+        raise ValueError("No card of class {} left in the shoe".format(
+            value_class))
+    return counts[:value_class] + (counts[value_class] - 1,) + \
+        counts[value_class + 1:]
+
+
+def final_index(state):
+    """
+    This function returns the final outcome of a dealer hand that stops
+    drawing
+    :param state: (int) state of the dealer's hand
+    :return: (int) index of the outcome in outcome_names, None if the dealer
+    draws another card
+    """
+    if hand_bust[state]:
+        return 5
+    total = hand_totals[state]
+    return total - dealer_threshold if total >= dealer_threshold else None
+
+
+# outcome index of every final hand state, None for the states drawing again
+final_outcomes = tuple(final_index(state) for state in range(num_states))
+# the number of cards does not change how the dealer plays, so the hands
+# drawing again are cached under the same state whatever their length
+drawing_states = tuple(hand_state(hard, ace, max_count) for hard, ace, _ in
+                       map(decode_state, range(num_states)))
+
+
+@lru_cache(maxsize=cache_size)
+def dealer_outcomes(state, counts):
+    """
+    This function computes the probability of every final dealer hand,
+    starting from hand 'state' with the shoe composition 'counts'. Draws
+    ending the dealer's hand are added directly, so only the hands that
+    draw again are computed (and cached) for the smaller shoe.
+    :param state: (int) state of the dealer's hand (see hand.py)
+    :param counts: (tuple(int)) number of cards of each value class
+    :return: (tuple(float)) probabilities of 17, 18, 19, 20, 21 and bust
+    """
+    final = final_outcomes[state]
+    if final is not None:
+        outcome = [0.0] * 6
+        outcome[final] = 1.0
+        return tuple(outcome)
+    cards = sum(counts)
+    if not cards:
+        raise ValueError("The shoe ran out of cards")
+    result = [0.0] * 6
+    for value_class, count in enumerate(counts):
+        if not count:
+            continue
+        weight = count / cards
+        following_state = transitions[state * num_ranks +
+                                      class_ranks[value_class]]
+        final = final_outcomes[following_state]
+        if final is not None:
+            result[final] += weight
+            continue
+        following = dealer_outcomes(drawing_states[following_state],
+                                    remove_card(counts, value_class))
+        result = [value + weight * probability
+                  for value, probability in zip(result, following)]
+    return tuple(result)
+
+
+def dealer_distribution(upcard, counts):
+    """
+    This function computes the exact distribution of the dealer's final
+    score given the dealer's face up card. The face down card is drawn from
+    the shoe like any other card.
+    :param upcard: (Card or int) the dealer's face up card, or its value
+    class (0 to 7 for 2 to 9, 8 for ten-valued cards and 9 for aces)
+    :param counts: (tuple(int)) composition of the remaining shoe, without
+    the face up card (see shoe_counts)
+    :return: (dict) probability of each final score (17 to 21) and 'bust'
+    """
+    if not isinstance(upcard, int):
+        upcard = rank_classes[upcard.rank_index]
+    state = transitions[empty_hand * num_ranks + class_ranks[upcard]]
+    return dict(zip(outcome_names, dealer_outcomes(state, tuple(counts))))
+
+
+def cache_info():
+    """
+    This function reports the usage of the memoization cache
+    :return: (functools._CacheInfo) hits, misses, maxsize and currsize
+    """
+    return dealer_outcomes.cache_info()
@@ -1,5 +1,6 @@
 import random
 import math
+from array import array
 
 # ANSI escape sequences for representing the card with colours
 yellow_background = "\u001b[48;5;230m"
@@ -8,13 +9,31 @@ red = "\u001b[31;1m"
 blue = "\u001b[34;1m"
 reset_colors = "\u001b[0m"
 
+# Lookup tables shared by every card. A card is encoded as a small integer
+# code = suit index * 13 + rank index, so a shoe is just an array of bytes.
+ranks = [str(n) for n in range(2, 11)] + ["J", "Q", "K", "A"]
+suits = ["Spades", "Hearts", "Clubs", "Diamonds"]
+suits_values = {"Spades": "\u2660", "Hearts": "\u2665",
+                "Clubs": "\u2663", "Diamonds": "\u2666"}
+rank_values = {"A": 11, "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
+               "7": 7, "8": 8, "9": 9, "10": 10, "J": 10, "Q": 10,
+               "K": 10}
+cards_per_deck = len(ranks) * len(suits)
+card_ranks = tuple(code % len(ranks) for code in range(cards_per_deck))
+card_values = tuple(rank_values[ranks[rank]] for rank in card_ranks)
+full_deck = array('B', range(cards_per_deck))  # codes of a 52 card deck
+
 
 class Card:
+    __slots__ = ("_code", "_up")
 
-    def __init__(self, rank, suit):
+    def __init__(self, rank, suit, up=False):
         """
         This function initialises an object of the Card class, representing
-        an actual playing card. Attributes:
+        an actual playing card. Cards are thin read-only views over an
+        integer card code, the rank and suit values live in the module level
+        lookup tables. Attributes:
+        code: (int) integer encoding of the card (suit index * 13 + rank index)
         rank: (str) rank of the card
         suit: (str) suit of the cards
         up: (bool) whether the card is face up or down (True for up)
@@ -22,17 +41,78 @@ class Card:
         rank_values: (int) face values of the card corresponding to the rank
         :param rank: (str) rank value of the card (2 to 'A')
         :param suit: (str) suit value of the card
+        :param up: (bool) whether the card is face up
+        """
+        self._code = suits.index(suit) * len(ranks) + ranks.index(rank)
+        self._up = up
+
+    @staticmethod
+    def view(code, up=False):
+        """
+        This function returns the shared, preallocated view of a card code,
+        so dealing a card does not allocate a new object
+        :param code: (int) integer encoding of the card
+        :param up: (bool) whether the card is face up
+        :return: Card object for the code
+        """
+        return card_views[code][up]
+
+    @property
+    def code(self):
+        return self._code
+
+    @property
+    def up(self):
+        return self._up
+
+    @property
+    def rank(self):
+        return ranks[card_ranks[self._code]]
+
+    @property
+    def rank_index(self):
+        return card_ranks[self._code]
+
+    @property
+    def suit(self):
+        return suits[self._code // len(ranks)]
+
+    @property
+    def value(self):
+        return card_values[self._code]
+
+    @property
+    def suits_values(self):
+        return suits_values
+
+    @property
+    def rank_values(self):
+        return rank_values
+
+    def flipped(self, up=True):
+        """
+        This function returns the view of the same card facing 'up'
+        :param up: (bool) whether the returned card is face up
+        :return: Card object
         """
-        self.rank = rank
-        self.suit = suit
-        self.up = False
-        self.suits_values = {"Spades": "\u2660", "Hearts": "\u2665",
-                             "Clubs": "\u2663", "Diamonds": "\u2666"}
-        self.rank_values = {"A": 11, "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
-                            "7": 7, "8": 8, "9": 9, "10": 10, "J": 10, "Q": 10,
-                            "K": 10}
+        return card_views[self._code][up]
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and self._code == other._code \
+            and self._up == other._up
+
+    def __hash__(self):
+        return hash((self._code, self._up))
 
     def __repr__(self):
+        """
+        This function returns the representation of the card, rendered once
+        per card and face (see render)
+        :return: (str) representation of the card object
+        """
+        return card_texts[self._code][self._up]
+
+    def render(self):
         """
         This function assigns a representation for the card object based on
         the suit and if the card is face up or down, based on an actual deck
@@ -46,23 +126,39 @@ class Card:
                 "?", "?")) + reset_colors
 
 
+def _make_view(code, up):
+    card = Card.__new__(Card)
+    card._code = code
+    card._up = up
+    return card
+
+
+# Preallocated face down and face up views of every card code
+card_views = tuple((_make_view(code, False), _make_view(code, True))
+                   for code in range(cards_per_deck))
+# ANSI representation of every card view, rendered once
+card_texts = tuple((down.render(), up.render()) for down, up in card_views)
+
+
 class Deck:
 
-    def __init__(self):
+    def __init__(self, decks=1, rng=random):
         """
-        Class Deck - an aggregation of class Card objects, symbolises a deck
-        of cards. Attributes:
-        ranks= (str) rank of the cars from 2 to 'A'
-        suits = (str) suits in a deck of playing cards
-        _cards =
+        Class Deck - a shoe of one or more decks of cards, stored as one byte
+        per card (see Card for the encoding). Attributes:
+        _cards = (array('B')) card codes in the deck, the last one is on top
+        rng = random number generator used to shuffle the deck
+        decks = (int) number of 52 card decks in the shoe
+        counter = (counting.Counter) card counter seeing every card dealt face
+        up, None if the cards are not counted
+        :param decks: (int) number of 52 card decks in the shoe
+        :param rng: (random.Random) random number generator, defaults to the
+        global one of the random module
         """
-        ranks = [str(n) for n in range(2, 11)]
-        ranks += ["J", "Q", "K", "A"]
-        suits = ["Spades", "Hearts", "Clubs", "Diamonds"]
-        self._cards = []
-        for suit in suits:
-            for rank in ranks:
-                self._cards.append(Card(rank, suit))
+        self._cards = full_deck * decks
+        self.rng = rng
+        self.decks = decks
+        self.counter = None
 
     def __len__(self):
         """
@@ -75,9 +171,9 @@ class Deck:
         """
         This function gets the object located at 'position' place in the deck
         :param position: (int) position in the deck whose object is sought
-        :return: Card object at place 'position' in the deck
+        :return: Card object at place 'position' in the deck (face down)
         """
-        return self._cards[position]
+        return card_views[self._cards[position]][False]
 
     def deal_card(self, face_up=True):
         """
@@ -86,25 +182,80 @@ class Deck:
         facilitate representing face up/down cards
         :return: object Card (default Face up)
         """
-        self._cards[-1].up = face_up
+        code = self._cards.pop()
+        if face_up and self.counter is not None:
+            self.counter.see(code)
+        return card_views[code][face_up]
+
+    def deal_code(self):
+        """
+        This function deals the code of the top card, for callers that do not
+        need a Card view
+        :return: (int) integer encoding of the card
+        """
         return self._cards.pop()
 
     def put_card(self, value):
         """
         This function is used to insert a card in a particular location in
         the dealer's deck
-        :param value: The position in the dealer's deck the card needs to be
-        inserted at
+        :param value: (Card or int) The card (or card code) to be put on top
+        of the dealer's deck
+        :return: None
+        """
+        self._cards.append(value if isinstance(value, int) else value.code)
+
+    def put_cards(self, cards):
+        """
+        This function puts a list of cards back on top of the dealer's deck
+        :param cards: (list(Card)) cards to be returned to the deck
+        :return: None
+        """
+        self._cards.extend([card.code for card in cards])
+
+    def add_decks(self, decks):
+        """
+        This function adds new 52 card decks on top of the deck, for tables
+        growing during a game
+        :param decks: (int) number of decks to be added
+        :return: None
+        """
+        self._cards.extend(full_deck * decks)
+        self.decks += decks
+
+    def reset(self, decks=None):
+        """
+        This function puts every card back into the deck, in order, for a
+        new game. The array of the cards is refilled in place.
+        :param decks: (int) number of decks of the new game, None to keep
+        the current number
         :return: None
         """
-        self._cards.append(value)
+        cards = self._cards
+        del cards[:]
+        self.decks = decks or self.decks
+        for _ in range(self.decks):
+            cards.extend(full_deck)
+        if self.counter is not None:
+            self.counter.reset()
 
     def shuffle(self):
         """
         This function shuffles the cards in the dealers deck randomly
         :return: None
         """
-        random.shuffle(self._cards)
+        self.rng.shuffle(self._cards)
+        if self.counter is not None:
+            self.counter.reset()
+
+    def start_round(self):
+        """
+        This function gets the deck ready for a new round. The cards
+        collected in the previous round were put back on top, so the whole
+        deck is shuffled again.
+        :return: None
+        """
+        self.shuffle()
 
     def cut(self):
         """
@@ -115,3 +266,121 @@ class Deck:
         middle = math.floor(len(self) / 2)
         self._cards.extend(self._cards[:middle])
         del self._cards[:middle]
+
+
+class Shoe(Deck):
+
+    def __init__(self, decks=1, rng=random, penetration=0.75,
+                 continuous=False):
+        """
+        Class Shoe - a dealing shoe that never needs a full shuffle. Every
+        card is dealt from a random position among the cards left in the shoe
+        (one swap per card, like a lazy Fisher-Yates shuffle), so the order of
+        the cards in the shoe never matters. Discarded cards either wait in
+        the discard tray until the cut card is reached (penetration) or go
+        straight back into the shoe (continuous shuffling machine).
+        Attributes:
+        size = (int) number of cards in the full shoe
+        penetration = (float) share of the shoe dealt before the discards are
+        shuffled back in
+        continuous = (bool) whether discards go straight back into the shoe
+        discards = (array('B')) codes of the discarded cards
+        reshuffles = (int) number of times the discards were shuffled back
+        :param decks: (int) number of 52 card decks in the shoe
+        :param rng: (random.Random) random number generator
+        :param penetration: (float) share of the shoe dealt before reshuffling
+        :param continuous: (bool) use a continuous shuffling machine
+        """
+        super().__init__(decks, rng)
+        self.size = len(self._cards)
+        self.penetration = penetration
+        self.continuous = continuous
+        self.discards = array('B')
+        self.reshuffles = 0
+
+    def deal_card(self, face_up=True):
+        """
+        This function deals a random card among the cards left in the shoe
+        :param face_up: status of the card dealt (face up or down)
+        :return: object Card (default Face up)
+        """
+        code = self.deal_code()
+        if face_up and self.counter is not None:
+            self.counter.see(code)
+        return card_views[code][face_up]
+
+    def deal_code(self):
+        """
+        This function deals the code of a random card among the cards left
+        in the shoe, moving the last card into its place
+        :return: (int) integer encoding of the card
+        """
+        cards = self._cards
+        if not cards:
+            self.shuffle()
+            if not cards:
+                raise ValueError("The shoe ran out of cards, every card is "
+                                 "in play")
+        pick = int(self.rng.random() * len(cards))
+        code = cards[pick]
+        cards[pick] = cards[-1]
+        cards.pop()
+        return code
+
+    def put_cards(self, cards):
+        """
+        This function discards the cards of a player: into the discard tray,
+        or back into the shoe with a continuous shuffling machine
+        :param cards: (list(Card)) cards to be discarded
+        :return: None
+        """
+        if self.continuous:
+            self._cards.extend([card.code for card in cards])
+            if self.counter is not None:
+                self.counter.unsee(cards)
+        else:
+            self.discards.extend([card.code for card in cards])
+
+    def add_decks(self, decks):
+        """
+        This function adds new 52 card decks to the shoe, which grows the cut
+        card position accordingly
+        :param decks: (int) number of decks to be added
+        :return: None
+        """
+        super().add_decks(decks)
+        self.size += decks * cards_per_deck
+
+    def reset(self, decks=None):
+        """
+        This function puts every card back into the shoe, the discards
+        included, for a new game
+        :param decks: (int) number of decks of the new game, None to keep
+        the current number
+        :return: None
+        """
+        super().reset(decks)
+        del self.discards[:]
+        self.size = len(self._cards)
+        self.reshuffles = 0
+
+    def shuffle(self):
+        """
+        This function shuffles the discards back into the shoe. As cards are
+        dealt from random positions, the cards left need no shuffling.
+        :return: None
+        """
+        self._cards.extend(self.discards)
+        del self.discards[:]
+        self.reshuffles += 1
+        if self.counter is not None:
+            self.counter.reset()
+
+    def start_round(self):
+        """
+        This function gets the shoe ready for a new round, shuffling the
+        discards back in once the cut card was reached
+        :return: None
+        """
+        if len(self._cards) < self.size * (1 - self.penetration):
+            self.shuffle()
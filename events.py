@@ -0,0 +1,160 @@
+import os
+import struct
+from deck import ranks, suits, suits_values, card_ranks
+
+# Round event log. Every event is a fixed width little-endian record of
+# 9 bytes: round number (uint32), player id (uint16), event kind (uint8),
+# card code (uint8, no_card if the event has no card) and the player's score
+# after the event (uint8). Records are appended through a buffered file, and
+# read back lazily in chunks so logs of any size can be replayed or filtered.
+# A log appended to by a later session goes on numbering rounds from its last
+# round, so the rounds of the sessions never mix.
+record_format = struct.Struct("<IHBBB")
+no_card = 255
+deal, hole, hit, stay, flip, bust, winner = range(1, 8)
+double, split, surrender = range(8, 11)  # rule variants (see rules.py)
+event_names = {deal: "deal", hole: "hole", hit: "hit", stay: "stay",
+               flip: "flip", bust: "bust", winner: "winner",
+               double: "double", split: "split", surrender: "surrender"}
+buffer_size = 1 << 16  # bytes buffered before writing to disk
+chunk_records = 4096  # records read at once
+
+
+class EventWriter:
+
+    def __init__(self, path, buffer_size=buffer_size):
+        """
+        Class EventWriter - appends round events to a binary log file.
+        Attributes:
+        round = (int) number of the current round, stamped on every event
+        (the last round of the file if it exists)
+        :param path: (str) path of the log file (appended to if it exists,
+        after dropping a record torn by a crash)
+        :param buffer_size: (int) bytes buffered before writing to disk
+        """
+        self._file = open(path, "ab", buffering=buffer_size)
+        end = self._file.tell()
+        if end % record_format.size:
+            self._file.truncate(end - end % record_format.size)
+        self.round = last_round(path)
+        self._pack = record_format.pack
+
+    def new_round(self):
+        """
+        This method starts a new round, the following events are stamped
+        with the next round number
+        :return: None
+        """
+        self.round += 1
+
+    def record(self, player_id, kind, card=no_card, score=0):
+        """
+        This method appends an event to the log
+        :param player_id: (int) id of the player concerned
+        :param kind: (int) kind of event (deal, hole, hit, stay, flip, bust
+        or winner)
+        :param card: (int) code of the card concerned, or no_card
+        :param score: (int) score of the player after the event
+        :return: None
+        """
+        self._file.write(self._pack(self.round, player_id, kind, card, score))
+
+    def flush(self):
+        """
+        This method writes the buffered events to disk
+        :return: None
+        """
+        self._file.flush()
+
+    def close(self):
+        """
+        This method flushes and closes the log file
+        :return: None
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def last_round(path):
+    """
+    This function reads the round number of the last event of a log file
+    :param path: (str) path of the log file
+    :return: (int) the round number, 0 for an empty or missing file
+    """
+    try:
+        with open(path, "rb") as log_file:
+            end = log_file.seek(0, os.SEEK_END)
+            whole = end - end % record_format.size
+            if not whole:
+                return 0
+            log_file.seek(whole - record_format.size)
+            return record_format.unpack(log_file.read(record_format.size))[0]
+    except FileNotFoundError:
+        return 0
+
+
+def read_events(path, kinds=None, players=None, rounds=None):
+    """
+    This function lazily reads the events of a log file, optionally keeping
+    only some kinds of events, players or rounds
+    :param path: (str) path of the log file
+    :param kinds: (set(int)) kinds of events to keep (all if None)
+    :param players: (set(int)) ids of the players to keep (all if None)
+    :param rounds: (range or set(int)) round numbers to keep (all if None)
+    :return: (generator) tuples (round, player id, kind, card code, score)
+    """
+    chunk_size = record_format.size * chunk_records
+    with open(path, "rb") as log_file:
+        while True:
+            chunk = log_file.read(chunk_size)
+            if not chunk:
+                break
+            whole = len(chunk) - len(chunk) % record_format.size
+            for event in record_format.iter_unpack(memoryview(chunk)[:whole]):
+                if kinds is not None and event[2] not in kinds:
+                    continue
+                if players is not None and event[1] not in players:
+                    continue
+                if rounds is not None and event[0] not in rounds:
+                    continue
+                yield event
+
+
+def replay(path, **filters):
+    """
+    This function replays a log file round by round
+    :param path: (str) path of the log file
+    :param filters: keyword filters passed on to read_events
+    :return: (generator) tuples (round, list of the round's events)
+    """
+    current = None
+    events = []
+    for event in read_events(path, **filters):
+        if event[0] != current:
+            if events:
+                yield current, events
+            current = event[0]
+            events = []
+        events.append(event)
+    if events:
+        yield current, events
+
+
+def describe(event):
+    """
+    This function formats an event for reading
+    :param event: (tuple) event as returned by read_events
+    :return: (str) description of the event
+    """
+    round_number, player_id, kind, card, score = event
+    text = "round {} player {} {}".format(round_number, player_id,
+                                         event_names.get(kind, kind))
+    if card != no_card:
+        text += " " + ranks[card_ranks[card]] + suits_values[
+            suits[card // len(ranks)]]
+    return text + " score {}".format(score)
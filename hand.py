@@ -0,0 +1,91 @@
+from array import array
+from deck import ranks, rank_values
+
+# A hand is encoded as a single integer state built from
+# hard total (aces counted as 1, 0 to 31), whether the hand holds an ace and
+# the number of cards (0, 1, 2 or 3 for three and more). More than one ace
+# never matters, as only one of them can be counted as 11 without busting.
+# Every property of a hand is then a lookup in the tables below, and adding a
+# card is a lookup in the transition table indexed by state and rank index.
+max_hard = 31
+max_count = 3
+num_ranks = len(ranks)
+num_states = (max_hard + 1) * 2 * (max_count + 1)
+empty_hand = 0
+
+# hard value of each rank index (aces count as 1)
+hard_values = tuple(1 if rank == "A" else rank_values[rank] for rank in ranks)
+
+
+def hand_state(hard, ace, count):
+    """
+    This function encodes a hand as a state index
+    :param hard: (int) total of the hand counting aces as 1
+    :param ace: (bool) whether the hand holds at least one ace
+    :param count: (int) number of cards in the hand
+    :return: (int) state index of the hand
+    """
+    return (hard * 2 + bool(ace)) * (max_count + 1) + min(count, max_count)
+
+
+def decode_state(state):
+    """
+    This function decodes a state index into the components of the hand
+    :param state: (int) state index of the hand
+    :return: (tuple) hard total, ace flag and (capped) card count
+    """
+    rest, count = divmod(state, max_count + 1)
+    hard, ace = divmod(rest, 2)
+    return hard, bool(ace), count
+
+
+def build_tables():
+    """
+    This function precomputes the transition table and the per-state totals,
+    softness, blackjack and bust flags
+    :return: (tuple) transitions, totals, soft, blackjack and bust tables
+    """
+    transitions = array('B', bytes(num_states * num_ranks))
+    totals = array('B', bytes(num_states))
+    soft = array('B', bytes(num_states))
+    blackjack = array('B', bytes(num_states))
+    bust = array('B', bytes(num_states))
+    for state in range(num_states):
+        hard, ace, count = decode_state(state)
+        is_soft = ace and hard + 10 <= 21
+        totals[state] = hard + 10 if is_soft else hard
+        soft[state] = is_soft
+        blackjack[state] = count == 2 and totals[state] == 21
+        bust[state] = hard > 21
+        for rank in range(num_ranks):
+            if hard > 21:
+                # a busted hand does not change any more
+                transitions[state * num_ranks + rank] = state
+                continue
+            transitions[state * num_ranks + rank] = hand_state(
+                hard + hard_values[rank], ace or ranks[rank] == "A",
+                count + 1)
+    return transitions, totals, soft, blackjack, bust
+
+
+transitions, hand_totals, hand_soft, hand_blackjack, hand_bust = build_tables()
+
+
+def add_card(state, rank):
+    """
+    This function adds a card to a hand
+    :param state: (int) state index of the hand
+    :param rank: (int) rank index of the card (see deck.ranks)
+    :return: (int) state index of the new hand
+    """
+    return transitions[state * num_ranks + rank]
+
+
+def evaluate(state):
+    """
+    This function evaluates a hand
+    :param state: (int) state index of the hand
+    :return: (tuple) total, softness, blackjack and bust of the hand
+    """
+    return (hand_totals[state], bool(hand_soft[state]),
+            bool(hand_blackjack[state]), bool(hand_bust[state]))
@@ -0,0 +1,276 @@
+import contextvars
+import functools
+import inspect
+import time
+import blackjack
+import pacing
+import player
+import tools
+
+# Optional instrumentation of the hot paths. enable() wraps the instrumented
+# functions with timers and disable() puts the originals back, so the game
+# runs the unwrapped code (at no cost) while instrumentation is off. Every
+# call is counted and its latency added to a histogram with power of two
+# buckets (in nanoseconds), per phase and per table (see Dealer.table_id).
+# Coroutine methods (the asyncio tables of async_game.py and server.py) are
+# timed from their call to their return under the same phase names, and the
+# current table is kept per task, so tables sharing an event loop are told
+# apart.
+method_targets = [
+    (player.Dealer, "deal", "deal"),
+    (player.Dealer, "poll", "poll"),
+    (player.Dealer, "apoll", "poll"),
+    (player.HumanPlayer, "call", "call"),
+    (player.HumanPlayer, "acall", "call"),
+    (player.ComputerPlayer, "call", "call"),
+    (player.ComputerPlayer, "acall", "call"),
+    (player.Dealer, "call", "call"),
+    (player.Dealer, "acall", "call"),
+    # the winners are counted as every turn ends (settle), find_winners then
+    # records them, for both check_winner and play_round
+    (blackjack.Game, "settle", "check_winner"),
+    (blackjack.Game, "find_winners", "check_winner"),
+    (pacing.Pacing, "delay", "sleep"),
+    (pacing.Pacing, "adelay", "sleep"),
+]
+render_targets = ["validate_input", "move_lines_up", "move_lines_down",
+                  "clear_prev_lines", "overwrite_prev_line",
+                  "update_current_line", "clear_screen"]
+# modules importing the rendering functions with 'from tools import *'
+render_modules = [tools, player, blackjack]
+num_buckets = 64
+metrics = {}
+originals = []
+# table of the dealer currently dealing or polling, in the current task
+current_table = contextvars.ContextVar("current_table", default=0)
+
+
+class Histogram:
+
+    def __init__(self):
+        """
+        Class Histogram - call count and latency histogram of a phase.
+        Attributes:
+        count = (int) number of calls
+        total = (int) total latency in nanoseconds
+        buckets = (list(int)) number of calls with a latency below 2 ** index
+        nanoseconds (and at least 2 ** (index - 1))
+        """
+        self.count = 0
+        self.total = 0
+        self.buckets = [0] * num_buckets
+
+    def observe(self, nanoseconds):
+        """
+        This method records the latency of a call
+        :param nanoseconds: (int) latency of the call
+        :return: None
+        """
+        self.count += 1
+        self.total += nanoseconds
+        self.buckets[min(nanoseconds.bit_length(), num_buckets - 1)] += 1
+
+    def percentile(self, share):
+        """
+        This method estimates a latency percentile, as the upper bound of the
+        bucket holding it
+        :param share: (float) percentile wanted, between 0 and 1
+        :return: (float) latency in seconds
+        """
+        if not self.count:
+            return 0.0
+        rank = share * self.count
+        seen = 0
+        for bucket, calls in enumerate(self.buckets):
+            seen += calls
+            if seen >= rank:
+                return (1 << bucket) / 1e9
+        return (1 << (num_buckets - 1)) / 1e9
+
+
+def histogram(phase, table):
+    """
+    This function returns the histogram of a phase at a table, creating it
+    on first use
+    :param phase: (str) name of the phase
+    :param table: (int) id of the table
+    :return: (class Histogram) histogram of the phase
+    """
+    key = (phase, table)
+    if key not in metrics:
+        metrics[key] = Histogram()
+    return metrics[key]
+
+
+def call_table(self):
+    """
+    This function returns the table of a method call: the table of the
+    dealer of the call (Dealer and Game methods), which becomes the current
+    table, or the current table
+    :param self: object whose method is called
+    :return: (int) id of the table
+    """
+    dealer = self if isinstance(self, player.Dealer) else \
+        getattr(self, "dealer", None)
+    if dealer is not None:
+        current_table.set(dealer.table_id)
+        return dealer.table_id
+    return current_table.get()
+
+
+def timed_method(function, phase):
+    """
+    This function wraps a method with a timer. The table is taken from the
+    dealer of the call (Dealer and Game methods) or from the
+    dealer currently playing.
+    :param function: method to be wrapped
+    :param phase: (str) name of the phase
+    :return: wrapped method
+    """
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        table = call_table(self)
+        start = clock()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            histogram(phase, table).observe(clock() - start)
+    return wrapper
+
+
+def timed_coroutine(function, phase):
+    """
+    This function wraps a coroutine method with a timer, from the call to
+    the return of the coroutine (see timed_method)
+    :param function: coroutine method to be wrapped
+    :param phase: (str) name of the phase
+    :return: wrapped coroutine method
+    """
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    async def wrapper(self, *args, **kwargs):
+        table = call_table(self)
+        start = clock()
+        try:
+            return await function(self, *args, **kwargs)
+        finally:
+            histogram(phase, table).observe(clock() - start)
+    return wrapper
+
+
+def timed_function(function, phase):
+    """
+    This function wraps a function with a timer, counted at the table of the
+    dealer currently playing
+    :param function: function to be wrapped
+    :param phase: (str) name of the phase
+    :return: wrapped function
+    """
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            histogram(phase, current_table.get()).observe(clock() - start)
+    return wrapper
+
+
+def enable():
+    """
+    This function turns the instrumentation on
+    :return: None
+    """
+    if originals:
+        return
+    for owner, name, phase in method_targets:
+        function = owner.__dict__[name]
+        originals.append((owner, name, function))
+        timer = timed_coroutine if inspect.iscoroutinefunction(function) \
+            else timed_method
+        setattr(owner, name, timer(function, phase))
+    for name in render_targets:
+        function = getattr(tools, name)
+        wrapper = timed_function(function, "render")
+        for module in render_modules:
+            if getattr(module, name, None) is function:
+                originals.append((module, name, function))
+                setattr(module, name, wrapper)
+
+
+def disable():
+    """
+    This function turns the instrumentation off, restoring the original
+    functions. The collected metrics are kept.
+    :return: None
+    """
+    while originals:
+        owner, name, function = originals.pop()
+        setattr(owner, name, function)
+
+
+def reset():
+    """
+    This function clears the collected metrics
+    :return: None
+    """
+    metrics.clear()
+
+
+def snapshot():
+    """
+    This function summarises the collected metrics
+    :return: (dict) for every phase and table: call count, total and mean
+    latency and the 50th, 90th and 99th latency percentiles (in seconds)
+    """
+    summary = {}
+    for (phase, table), metric in sorted(metrics.items()):
+        summary.setdefault(phase, {})[table] = {
+            "count": metric.count,
+            "total": metric.total / 1e9,
+            "mean": metric.total / metric.count / 1e9 if metric.count else 0,
+            "p50": metric.percentile(0.5),
+            "p90": metric.percentile(0.9),
+            "p99": metric.percentile(0.99)}
+    return summary
+
+
+def prometheus_text():
+    """
+    This function formats the collected metrics in the Prometheus text
+    exposition format
+    :return: (str) metrics as a histogram per phase and table
+    """
+    name = "blackjack_phase_seconds"
+    lines = ["# HELP {} Latency of the game phases.".format(name),
+             "# TYPE {} histogram".format(name)]
+    for (phase, table), metric in sorted(metrics.items()):
+        labels = 'phase="{}",table="{}"'.format(phase, table)
+        last = max((bucket for bucket, calls in enumerate(metric.buckets)
+                    if calls), default=0)
+        seen = 0
+        for bucket in range(last + 1):
+            seen += metric.buckets[bucket]
+            lines.append('{}_bucket{{{},le="{:.9g}"}} {}'.format(
+                name, labels, (1 << bucket) / 1e9, seen))
+        lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels,
+                                                          metric.count))
+        lines.append("{}_sum{{{}}} {:.9f}".format(name, labels,
+                                                  metric.total / 1e9))
+        lines.append("{}_count{{{}}} {}".format(name, labels, metric.count))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """
+    This function writes the collected metrics to a Prometheus text file
+    :param path: (str) path of the file
+    :return: None
+    """
+    with open(path, "w") as metrics_file:
+        metrics_file.write(prometheus_text())
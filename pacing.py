@@ -0,0 +1,105 @@
+import random
+import time
+
+# Every deliberate delay of the game goes through a Pacing scheduler. Delays
+# are named, with their length (in seconds) at the cinematic pace, the
+# original pace of the game. A range is drawn uniformly for every delay.
+delays = {
+    "input": 0.5,  # before and after reading a key press
+    "prompt": 1,  # after a player count was entered
+    "deal": 1,  # per card shown while dealing
+    "redraw": 0.5,  # before a player's line is redrawn
+    "think": (1, 2.5),  # a bot thinking about its decision
+    "announce": 2,  # a bot's decision stays on the screen
+    "dealer": 1.5,  # the dealer thinking about his decision
+    "exit": 1.5,  # goodbye message
+}
+# animation delays are skipped at bot-only tables and count in the budget of
+# a round, the other delays keep prompts readable for the user
+animations = {"deal", "redraw", "think", "announce", "dealer"}
+profiles = {"instant": 0.0, "fast": 0.25, "cinematic": 1.0}
+
+
+class Pacing:
+
+    def __init__(self, profile="cinematic", scale=None, round_budget=None):
+        """
+        Class Pacing - scheduler owning the delays of a game. Attributes:
+        scale = (float) factor applied to every delay (0 to skip them all)
+        round_budget = (float) maximum seconds of animation per round, None
+        for no limit
+        bots_only = (bool) skip animation delays, set while no human plays
+        spent = (float) seconds of animation spent in the current round
+        :param profile: (str) 'instant', 'fast' or 'cinematic'
+        :param scale: (float) factor applied to every delay, overrides the
+        profile
+        :param round_budget: (float) maximum seconds of animation per round
+        """
+        self.scale = profiles[profile] if scale is None else scale
+        self.round_budget = round_budget
+        self.bots_only = False
+        self.spent = 0.0
+
+    def set_profile(self, profile):
+        """
+        This method changes the pace to one of the profiles
+        :param profile: (str) 'instant', 'fast' or 'cinematic'
+        :return: None
+        """
+        self.scale = profiles[profile]
+
+    def start_round(self):
+        """
+        This method starts a new round, resetting the animation budget
+        :return: None
+        """
+        self.spent = 0.0
+
+    def seconds(self, name, rng=random):
+        """
+        This method computes the length of the next 'name' delay
+        :param name: (str) name of the delay (see delays)
+        :param rng: random number generator for delays given as a range
+        :return: (float) seconds to wait
+        """
+        if not self.scale:
+            return 0.0
+        animation = name in animations
+        if animation and self.bots_only:
+            return 0.0
+        length = delays[name]
+        if isinstance(length, tuple):
+            length = rng.uniform(*length)
+        length *= self.scale
+        if animation and self.round_budget is not None:
+            length = max(0.0, min(length, self.round_budget - self.spent))
+            self.spent += length
+        return length
+
+    def delay(self, name, rng=random):
+        """
+        This method waits for the next 'name' delay
+        :param name: (str) name of the delay (see delays)
+        :param rng: random number generator for delays given as a range
+        :return: None
+        """
+        length = self.seconds(name, rng)
+        if length:
+            time.sleep(length)
+
+    async def adelay(self, name, rng=random):
+        """
+        This coroutine waits for the next 'name' delay without blocking the
+        event loop
+        :param name: (str) name of the delay (see delays)
+        :param rng: random number generator for delays given as a range
+        :return: None
+        """
+        import asyncio  # only imported by the asyncio game loop
+        length = self.seconds(name, rng)
+        if length:
+            await asyncio.sleep(length)
+
+
+# scheduler of the terminal game
+scheduler = Pacing()
@@ -0,0 +1,134 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from blackjack import Game
+from batch import simulate_batch
+
+# The work is always split in chunks of the same size, whatever the number of
+# workers, and every chunk gets its own random.Random stream seeded from the
+# master seed and the chunk's position. Results are merged in chunk order, so
+# the same master seed gives identical results with 1 or 64 workers.
+chunk_rounds = 20000  # rounds per chunk
+
+
+def chunk_seeds(seed, chunks):
+    """
+    This function derives an independent seed for every chunk of a run from
+    the master seed
+    :param seed: (int) master seed of the run
+    :param chunks: (int) number of chunks
+    :return: (list(int)) seed of every chunk
+    """
+    master = random.Random(seed)
+    return [master.getrandbits(64) for _ in range(chunks)]
+
+
+def split_rounds(rounds, chunk_size):
+    """
+    This function splits 'rounds' in chunks of 'chunk_size' rounds (the last
+    chunk may be smaller)
+    :param rounds: (int) total number of rounds
+    :param chunk_size: (int) rounds per chunk
+    :return: (list(int)) number of rounds of every chunk
+    """
+    return [min(chunk_size, rounds - start)
+            for start in range(0, rounds, chunk_size)]
+
+
+def run_jobs(function, jobs, workers):
+    """
+    This function runs 'function' on every job, in a pool of worker
+    processes if more than one worker is requested
+    :param function: module level function taking a single job argument
+    :param jobs: (list) arguments of every job
+    :param workers: (int) number of worker processes (None for one per core)
+    :return: (list) results of the jobs, in the order of the jobs
+    """
+    if workers == 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, jobs))
+
+
+def game_chunk(job):
+    """
+    This function plays one chunk of headless rounds of Game
+    :param job: (tuple) computer players, bot thresholds by player id,
+    rounds and seed of the chunk
+    :return: (dict) aggregate results of Game.simulate
+    """
+    computer_players, thresholds, rounds, seed = job
+    game = Game(0, computer_players, headless=True, rng=random.Random(seed))
+    game.seat_players()
+    for player in game.table:
+        if player.id in thresholds:
+            player.threshold = thresholds[player.id]
+    return game.simulate(rounds)
+
+
+def simulate_parallel(rounds, computer_players=5, seed=0, workers=None,
+                      chunk_size=chunk_rounds):
+    """
+    This function plays 'rounds' headless rounds of Game split across worker
+    processes. The bots keep the same thresholds in every chunk, derived
+    from the master seed.
+    :param rounds: (int) number of rounds to be played
+    :param computer_players: (int) number of bots at the table
+    :param seed: (int) master seed of the run
+    :param workers: (int) number of worker processes (None for one per core)
+    :param chunk_size: (int) rounds per chunk
+    :return: (dict) merged results in the format of Game.simulate, with the
+    'thresholds' of the bots by name
+    """
+    master = random.Random(seed)
+    # bot ids follow the naming of Game.seat_players
+    thresholds = {player_id: master.randint(14, 18)
+                  for player_id in range(1, computer_players + 1)}
+    sizes = split_rounds(rounds, chunk_size)
+    seeds = chunk_seeds(master.getrandbits(64), len(sizes))
+    jobs = [(computer_players, thresholds, size, chunk_seed)
+            for size, chunk_seed in zip(sizes, seeds)]
+    merged = {"rounds": 0, "wins": {}, "busts": {}, "no_winner": 0}
+    for result in run_jobs(game_chunk, jobs, workers):
+        merged["rounds"] += result["rounds"]
+        merged["no_winner"] += result["no_winner"]
+        for key in ("wins", "busts"):
+            for name, count in result[key].items():
+                merged[key][name] = merged[key].get(name, 0) + count
+    merged["thresholds"] = {"Player" + str(player_id + 1): threshold
+                            for player_id, threshold in thresholds.items()}
+    return merged
+
+
+def batch_chunk(job):
+    """
+    This function plays one chunk of rounds with the batch simulator
+    :param job: (tuple) thresholds, rounds, decks and seed of the chunk
+    :return: (dict) results of batch.simulate_batch
+    """
+    thresholds, rounds, decks, seed = job
+    return simulate_batch(thresholds, rounds, decks, seed)
+
+
+def batch_parallel(thresholds, rounds, decks=1, seed=0, workers=None,
+                   chunk_size=chunk_rounds):
+    """
+    This function runs batch.simulate_batch split across worker processes
+    :param thresholds: (list(int)) threshold of every bot at the table
+    :param rounds: (int) number of rounds to be played
+    :param decks: (int) number of decks in each shoe
+    :param seed: (int) master seed of the run
+    :param workers: (int) number of worker processes (None for one per core)
+    :param chunk_size: (int) rounds per chunk
+    :return: (dict) per-round results in the format of
+    batch.simulate_batch, concatenated in chunk order
+    """
+    sizes = split_rounds(rounds, chunk_size)
+    jobs = [(thresholds, size, decks, chunk_seed)
+            for size, chunk_seed in zip(sizes, chunk_seeds(seed, len(sizes)))]
+    merged = simulate_batch(thresholds, 0)
+    for result in run_jobs(batch_chunk, jobs, workers):
+        merged["dealer"].extend(result["dealer"])
+        for seat in range(len(thresholds)):
+            merged["scores"][seat].extend(result["scores"][seat])
+            merged["outcomes"][seat].extend(result["outcomes"][seat])
+    return merged
@@ -1,9 +1,17 @@
 from abc import ABC, abstractmethod
 from tools import *
+from hand import (empty_hand, transitions, num_ranks, hand_totals, hand_soft,
+                  hand_blackjack)
+from rules import (classic, can_hit, can_double, can_split, can_surrender)
+from dealer_odds import rank_classes, num_classes
+from strategy import basic_strategy
+import events
 import random
-import time
 
 busted_list = ["😭", "🤦", "😱", "💔", "👎", "🙈"]
+# decisions of the bots as announced on the terminal
+decision_names = {'h': "Hit", 's': "Stay", 'd': "Double down", 'p': "Split",
+                  'r': "Surrender"}
 
 
 def prompt_name(player):
@@ -13,7 +21,7 @@ def prompt_name(player):
     :param player: Player object whose name is prompted to be changed
     :return: None
     """
-    time.sleep(0.5)
+    scheduler.delay("input")
     player_type = "(h)uman" if player.type == 'h' else "(b)ot"
     print("{} is of type {}. Would you like to rename {}?".format(player.name,
                                                                   player_type,
@@ -26,7 +34,7 @@ def prompt_name(player):
         name = input("Please type name and press enter key: \n")
         player.name = name
         clear_prev_lines(2)
-        time.sleep(0.5)
+        scheduler.delay("input")
     clear_prev_lines(1)
 
 
@@ -41,16 +49,48 @@ class Player(ABC):
         type: (str) Type of the player
         cards: (list(Card)) List of card objects
         score:(int) Score of the participant
-        have_Ace: (bool) If the participant has an Ace in hand
+        hand: (int) state index of the hand (see hand.py)
+        have_Ace: (bool) If the participant counts an Ace as 11 in hand
         status: (str) Emphatic representation of the player's status in the game
+        headless: (bool) If the participant plays without terminal I/O or
+        delays
+        rng: random number generator of the participant (random module or
+        random.Random)
+        upcard: (Card) the dealer's face up card in the current round
+        bankroll: (int) chips of the participant (tournaments, see
+        tournament.py)
+        bet: (int) chips staked on the current round (on the current hand
+        after a split)
+        actions: (int) actions the rules allow on the current hand (bit mask,
+        see rules.py)
+        hands: (int) number of hands played in the current round (more than
+        one after a split)
+        pending: (list(tuple)) split hands waiting to be played, as their
+        first card and bet
+        finished: (list(tuple)) split hands already played, as their cards,
+        hand state, score, bet and whether they were surrendered
+        surrendered: (bool) If the current hand was surrendered
+        insurance: (int) chips staked on insurance in the current round
         """
         self.id = 0
         self.name = "default"
         self.type = "default"
         self.cards = []
         self.score = 0
+        self.hand = empty_hand
         self.have_Ace = False
         self.status = ""
+        self.headless = False
+        self.rng = random
+        self.upcard = None
+        self.bankroll = 0
+        self.bet = 0
+        self.actions = can_hit
+        self.hands = 1
+        self.pending = []
+        self.finished = []
+        self.surrendered = False
+        self.insurance = 0
 
     def __repr__(self):
         """
@@ -64,25 +104,88 @@ class Player(ABC):
     def call(self):
         pass
 
+    async def acall(self, pacing=scheduler):
+        """
+        This coroutine is the non-blocking counterpart of call(), used by the
+        asyncio game loop (see async_game.py)
+        :param pacing: (class Pacing) scheduler of the delays
+        :return: (str) Decision of the participant ('h' or 's')
+        """
+        return self.call()
+
     def update_score(self, card):
         """
-        This function calculates the total score of the hand of the participant
+        This function calculates the total score of the hand of the
+        participant with a single lookup in the hand transition table
         :param card: (Card) Card object, which on receiving, the player's
         score is updated.
         :return: None
         """
-        if card.rank == 'A':
-            if self.score < 11:
-                self.score += 11
-                self.have_Ace = True
-            else:
-                self.score += 1
-        else:
-            self.score += card.rank_values[card.rank]
-        if self.score > 21 and self.have_Ace:
-            self.score -= 10
-            self.have_Ace = False
-        self.update_status()
+        self.hand = hand = transitions[self.hand * num_ranks + card.rank_index]
+        self.score = hand_totals[hand]
+        self.have_Ace = hand_soft[hand] == 1
+        if self.score > 21:
+            self.update_status()
+
+    def wager(self, minimum):
+        """
+        This function places the participant's bet for the next round: the
+        table minimum, or all the chips left if they are fewer
+        :param minimum: (int) minimum bet of the table
+        :return: (int) the bet
+        """
+        self.bet = min(self.bankroll, minimum)
+        return self.bet
+
+    def insure(self):
+        """
+        This function decides the insurance bet of the participant against a
+        dealer ace (none by default)
+        :return: (int) chips staked on insurance, at most half the bet
+        """
+        return 0
+
+    def rescore(self):
+        """
+        This function recomputes the score and hand state from the cards of
+        the participant (after a split)
+        :return: None
+        """
+        self.score = 0
+        self.hand = empty_hand
+        for card in self.cards:
+            self.update_score(card)
+
+    def clear_hand(self):
+        """
+        This function clears the score and hand state of the participant,
+        and the split hands, surrender and insurance of the round
+        :return: None
+        """
+        self.score = 0
+        self.hand = empty_hand
+        self.have_Ace = False
+        if self.hands > 1:
+            self.hands = 1
+            self.finished.clear()
+        self.surrendered = False
+        self.insurance = 0
+
+    def reset(self):
+        """
+        This function returns the participant to the state of a new player
+        for a new game, in place (see Game.new_game). The cards must have
+        been collected.
+        :return: None
+        """
+        self.clear_hand()
+        self.cards.clear()
+        self.pending.clear()
+        self.status = ""
+        self.upcard = None
+        self.bankroll = 0
+        self.bet = 0
+        self.actions = can_hit
 
     def update_status(self):
         """
@@ -90,22 +193,28 @@ class Player(ABC):
         :return: None
         """
         if self.score > 21:
-            self.status = "You got busted!!! " + (random.sample(busted_list,
-                                                                1))[0]
+            self.status = "You got busted!!! " + (self.rng.sample(busted_list,
+                                                                  1))[0]
 
 
 class HumanPlayer(Player):
-    def __init__(self, name):
+    def __init__(self, name, headless=False):
         """
         This class creates a human player object and prompts for a name change
         name = (str) Name of the player
         type = (str) type of the player ('h' for human)
+        input_source = (coroutine function) source of the key presses of the
+        player in the asyncio game loop (the keyboard by default)
         :param name: (str) default name assigned by the game
+        :param headless: (bool) skip the name prompt if True
         """
         super().__init__()
         self.name = name
         self.type = 'h'
-        prompt_name(self)
+        self.headless = headless
+        self.input_source = async_readch
+        if not headless:
+            prompt_name(self)
 
     def call(self):
         """
@@ -119,9 +228,22 @@ class HumanPlayer(Player):
                               " is not a valid input. Please press h to hit, "
                               "or s to stay")
 
+    async def acall(self, pacing=scheduler):
+        """
+        This coroutine waits for the decision of the human player from the
+        player's input source without blocking the event loop. Invalid keys
+        are ignored.
+        :param pacing: (class Pacing) scheduler of the delays
+        :return: (str) Decision of the human player (hit ('h') or stay ('s'))
+        """
+        while True:
+            read = str.lower(await self.input_source())
+            if read in ('h', 's'):
+                return read
+
 
 class ComputerPlayer(Player):
-    def __init__(self, name):
+    def __init__(self, name, headless=False, rng=random):
         """
         This class creates a human player object and prompts for a name change
         name = (str) Name of the player
@@ -129,53 +251,171 @@ class ComputerPlayer(Player):
         threshold = random integer between 14 and 18 (both inclusive) above
         which the computer player will not ask to hit
         :param name: (str) default name assigned by the game
+        :param headless: (bool) skip the name prompt and the simulated
+        thinking delays if True
+        :param rng: (random.Random) random number generator of the bot
         """
         super().__init__()
         self.name = name
         self.type = 'b'
-        self.threshold = random.randint(14, 18)
-        prompt_name(self)
+        self.rng = rng
+        self.threshold = rng.randint(14, 18)
+        self.headless = headless
+        if not headless:
+            prompt_name(self)
+
+    def reset(self):
+        """
+        This method returns the bot to the state of a new bot for a new
+        game, with a new threshold
+        :return: None
+        """
+        super().reset()
+        self.threshold = self.rng.randint(14, 18)
+
+    def decide(self):
+        """
+        This method contains the decision rule of the bot without any
+        terminal output. The bot takes the actions of the rule variants it
+        likes (see variant_decision), otherwise it asks to hit if the current
+        hand score is below the threshold else stay with the hand
+        :return: (str) Decision of the computer player (hit ('h), stay ('s'),
+        double ('d'), split ('p') or surrender ('r'))
+        """
+        if self.actions & ~can_hit:
+            decision = self.variant_decision()
+            if decision:
+                return decision
+        return 'h' if self.score < self.threshold else 's'
+
+    def variant_decision(self):
+        """
+        This method decides on the actions of the rule variants: the bot
+        splits aces and eights, surrenders a hard 16 against a 10 or an ace
+        and doubles a hard 10 or 11 against a lower card
+        :return: (str) 'p', 'r' or 'd', None to hit or stay
+        """
+        actions = self.actions
+        if actions & can_split and self.cards[0].rank in ("A", "8"):
+            return 'p'
+        if self.have_Ace:
+            return None
+        if (actions & can_surrender and self.score == 16 and
+                self.upcard.value >= 10):
+            return 'r'
+        if (actions & can_double and self.score in (10, 11) and
+                self.upcard.value < self.score):
+            return 'd'
+        return None
 
     def call(self):
         """
         This method enables the bot to 'call' their decisions based on their
-        current hand. The bot asks to hit if the current hand score is below
-        the threshold else stay with the hand
-        :return: (str) Decision of the computer player (hit ('h) or stay ('s'))
+        current hand, announcing the decision on the terminal unless the bot
+        is headless.
+        :return: (str) Decision of the computer player (hit ('h), stay ('s'),
+        double ('d'), split ('p') or surrender ('r'))
         """
+        if self.headless:
+            return self.decide()
         print("{} is playing... ".format(self.name), end="")
-        time.sleep(random.uniform(1, 2.5))  # to simulate delay in player
+        scheduler.delay("think", self.rng)  # to simulate delay in player
         # decision
-        if self.score < self.threshold:
-            print("{} chose to Hit.".format(self.name))
-            time.sleep(2)
-            clear_prev_lines(1)
-            sys.stdout.flush()
+        decision = self.decide()
+        print("{} chose to {}.".format(self.name, decision_names[decision]))
+        scheduler.delay("announce")
+        clear_prev_lines(1)
+        sys.stdout.flush()
+        return decision
+
+    async def acall(self, pacing=scheduler):
+        """
+        This coroutine takes the bot's decision after the same simulated
+        thinking delays as call(), without blocking the event loop
+        :param pacing: (class Pacing) scheduler of the delays
+        :return: (str) Decision of the computer player (hit ('h) or stay ('s'))
+        """
+        await pacing.adelay("think", self.rng)
+        await pacing.adelay("announce")
+        return self.decide()
+
+
+class BasicStrategyPlayer(ComputerPlayer):
+    def __init__(self, name, headless=False, rng=random, decks=1):
+        """
+        This class creates a bot that plays basic strategy: it hits or stays
+        depending on its hand and the dealer's face up card, looking the
+        decision up in a precomputed table (see strategy.py)
+        strategy = (memoryview) decision table of the bot
+        decks = (int) number of decks the strategy is computed for
+        :param name: (str) default name assigned by the game
+        :param headless: (bool) skip the name prompt and the simulated
+        thinking delays if True
+        :param rng: (random.Random) random number generator of the bot
+        :param decks: (int) number of decks the strategy is computed for
+        """
+        super().__init__(name, headless, rng)
+        self.use_decks(decks)
+
+    def use_decks(self, decks):
+        """
+        This method switches the bot to the strategy table of a shoe of
+        'decks' decks
+        :param decks: (int) number of decks in the shoe
+        :return: None
+        """
+        self.decks = decks
+        self.strategy = basic_strategy(decks)
+
+    def decide(self):
+        """
+        This method looks the bot's decision up in the strategy table
+        :return: (str) Decision of the computer player (hit ('h) or stay ('s'))
+        """
+        if self.strategy[self.hand * num_classes +
+                         rank_classes[self.upcard.rank_index]]:
             return 'h'
-        else:
-            print("{} chose to Stay.".format(self.name))
-            time.sleep(2)
-            clear_prev_lines(1)
-            sys.stdout.flush()
-            return 's'
+        return 's'
 
 
 class Dealer(Player):
-    def __init__(self, game_deck):
+    def __init__(self, game_deck, headless=False, rules=None):
         """
         This method initialises a dealer object for the game and gets the
         deck of cards ready to be dealt to players. Attributes:
         deck = (class Deck) Deck of cards with the dealer for playing blackjack
+        log = (events.EventWriter) event log of the table, None if the game
+        is not recorded
+        table_id = (int) id of the dealer's table, used to label metrics
+        rules = (rules.CompiledRules) the rules of the table
         :param game_deck: (class Deck) Deck of cards used by the game
+        :param headless: (bool) deal and play without terminal output if True
+        :param rules: (rules.CompiledRules) the rules of the table, the
+        classic rules if None
         """
         super().__init__()
         self.name = "Dealer"
         self.type = "dealer"
+        self.headless = headless
+        self.log = None
+        self.table_id = 0
+        self.rules = rules or classic.compile()
         self.deck = game_deck
         self.deck.shuffle()
         self.deck.cut()
         self.deck.shuffle()
 
+    def reset(self):
+        """
+        This method gets the dealer ready for a new game, with the deck
+        shuffled and cut as by a new dealer
+        :return: None
+        """
+        super().reset()
+        self.deck.shuffle()
+        self.deck.cut()
+        self.deck.shuffle()
+
     def __repr__(self):
         """
         Representation of the dealer object. Prints name and hand
@@ -191,6 +431,9 @@ class Dealer(Player):
         the cards (2 cards) are to be dealt.
         :return: None
         """
+        if self.headless:
+            self.deal_silently(player_list)
+            return
         for player in player_list[0:-1]:
             card = self.deck.deal_card()
             player.update_score(card)
@@ -200,13 +443,80 @@ class Dealer(Player):
             player.update_score(card)
             player.cards.append(card)
             print(player, end="\n\n")
-            time.sleep(1)
+            scheduler.delay("deal")
         self.cards.append(self.deck.deal_card())
         self.update_score(self.cards[-1])
+        for player in player_list[0:-1]:
+            player.upcard = self.cards[0]
         update_current_line(self)
         self.cards.append(self.deck.deal_card(False))
+        if self.log is not None:
+            self.log_deal(player_list)
         print(self, end="\n\n")
-        time.sleep(1)
+        scheduler.delay("deal")
+
+    def deal_silently(self, player_list):
+        """
+        This method deals the first two cards to all the players on the table
+        in the same order as deal(), without any terminal output or delays
+        :param player_list: (list(class Player)) The list of players for whom
+        the cards (2 cards) are to be dealt, with the dealer as the last entry.
+        :return: None
+        """
+        deck = self.deck
+        for player in player_list[0:-1]:
+            card = deck.deal_card()
+            player.update_score(card)
+            player.cards.append(card)
+            card = deck.deal_card()
+            player.update_score(card)
+            player.cards.append(card)
+        self.cards.append(deck.deal_card())
+        self.update_score(self.cards[-1])
+        for player in player_list[0:-1]:
+            player.upcard = self.cards[0]
+        self.cards.append(deck.deal_card(False))
+        if self.log is not None:
+            self.log_deal(player_list)
+
+    def log_deal(self, player_list):
+        """
+        This method records the cards dealt to every player in the event log,
+        each with the score of the hand once it was dealt (the score after
+        the first card is looked up from the hand state tables)
+        :param player_list: (list(class Player)) The players dealt to, with the
+        dealer as the last entry.
+        :return: None
+        """
+        for player in player_list[0:-1]:
+            first, second = player.cards
+            self.log.record(player.id, events.deal, first.code, hand_totals[
+                transitions[empty_hand * num_ranks + first.rank_index]])
+            self.log.record(player.id, events.deal, second.code, player.score)
+        self.log.record(self.id, events.deal, self.cards[0].code, self.score)
+        self.log.record(self.id, events.hole, self.cards[1].code, self.score)
+
+    def offer(self, player):
+        """
+        This method sets the actions the rules allow on the player's current
+        hand, before the player decides
+        :param player: (class Player) Player about to decide
+        :return: None
+        """
+        rules = self.rules
+        cards = player.cards
+        if player.hands > 1 and cards[0].rank == "A" and \
+                not rules.split_ace_hits:
+            actions = 0  # split aces may only be split again
+        else:
+            actions = (rules.split_actions if player.hands > 1 else
+                       rules.actions)[player.hand]
+        if (rules.split_limit > 1 and len(cards) == 2 and
+                cards[0].rank_index == cards[1].rank_index and
+                player.hands < (rules.ace_split_limit if cards[0].rank == "A"
+                                else rules.split_limit)):
+            actions |= can_split
+        player.actions = actions
 
     def poll(self, player):
         """
@@ -215,17 +525,142 @@ class Dealer(Player):
         :param player: (class Player) Player from whom decision is elicited.
         :return: (str) Decision taken by the player
         """
-        read = player.call()
-        if read == 'h':
+        self.offer(player)
+        return self.respond(player, player.call())
+
+    async def apoll(self, player, pacing=scheduler):
+        """
+        This coroutine requests the player for his decision without blocking
+        the event loop (see poll)
+        :param player: (class Player) Player from whom decision is elicited.
+        :param pacing: (class Pacing) scheduler of the delays
+        :return: (str) Decision taken by the player
+        """
+        self.offer(player)
+        return self.respond(player, await player.acall(pacing))
+
+    def respond(self, player, read):
+        """
+        This method carries out the decision of a player: deals a card if
+        the player asked to hit (a hit the rules do not allow, on split aces,
+        is a stay)
+        :param player: (class Player) Player who took the decision
+        :param read: (str) Decision of the player ('h' or 's')
+        :return: (str) "hit", "stay", or "quit" for any other decision
+        """
+        if read == 'h' and player.actions & can_hit:
             card = self.deck.deal_card()
             player.update_score(card)
             player.cards.append(card)
+            if self.log is not None:
+                self.log.record(player.id, events.hit, card.code, player.score)
+                if player.score > 21:
+                    self.log.record(player.id, events.bust, events.no_card,
+                                    player.score)
             return "hit"
-        elif read == 's':
+        elif read in ('h', 's'):
+            if self.log is not None:
+                self.log.record(player.id, events.stay, events.no_card,
+                                player.score)
             return "stay"
+        elif read == 'd' and player.actions & can_double:
+            player.bet *= 2
+            card = self.deck.deal_card()
+            player.update_score(card)
+            player.cards.append(card)
+            if self.log is not None:
+                self.log.record(player.id, events.double, card.code,
+                                player.score)
+                if player.score > 21:
+                    self.log.record(player.id, events.bust, events.no_card,
+                                    player.score)
+            return "double"
+        elif read == 'p' and player.actions & can_split:
+            return self.split(player)
+        elif read == 'r' and player.actions & can_surrender:
+            player.surrendered = True
+            if self.log is not None:
+                self.log.record(player.id, events.surrender, events.no_card,
+                                player.score)
+            return "surrender"
         else:
             return "quit"
 
+    def split(self, player):
+        """
+        This method splits the pair of a player: the second card waits as a
+        new hand with the same bet, and the first hand gets a new card
+        :param player: (class Player) Player splitting a pair
+        :return: (str) "hit" to go on playing the first hand, "stay" for
+        split aces that may not be hit
+        """
+        card = player.cards.pop()
+        player.pending.append((card, player.bet))
+        player.hands += 1
+        if self.log is not None:
+            self.log.record(player.id, events.split, card.code, player.score)
+        return self.deal_split_hand(player)
+
+    def deal_split_hand(self, player):
+        """
+        This method deals the second card of a split hand
+        :param player: (class Player) Player with a split hand of one card
+        :return: (str) "hit" to play the hand, "stay" for split aces that may
+        not be hit (split aces dealt another ace are played if they may be
+        split again, see offer)
+        """
+        player.rescore()
+        card = self.deck.deal_card()
+        player.update_score(card)
+        player.cards.append(card)
+        if self.log is not None:
+            self.log.record(player.id, events.hit, card.code, player.score)
+        rules = self.rules
+        if player.cards[0].rank == "A" and not rules.split_ace_hits:
+            if card.rank == "A" and player.hands < rules.ace_split_limit:
+                return "hit"
+            return "stay"
+        return "hit"
+
+    def next_hand(self, player):
+        """
+        This method moves a player who split on to their next hand, once the
+        current one is over
+        :param player: (class Player) Player whose hand is over
+        :return: (str) "hit" or "stay" (see deal_split_hand), None if the
+        player has no hand left to play
+        """
+        if not player.pending:
+            return None
+        player.finished.append((player.cards, player.hand, player.score,
+                                player.bet, player.surrendered))
+        card, player.bet = player.pending.pop()
+        player.cards = [card]
+        player.surrendered = False
+        return self.deal_split_hand(player)
+
+    def peek(self):
+        """
+        This method checks whether the dealer's face down card makes a
+        blackjack, without showing it
+        :return: (bool) True if the dealer has a blackjack
+        """
+        return bool(hand_blackjack[transitions[
+            self.hand * num_ranks + self.cards[1].rank_index]])
+
+    def offer_insurance(self, player_list):
+        """
+        This method offers insurance to the players when the dealer's face up
+        card is an ace
+        :param player_list: (list(class Player)) The players, with the dealer
+        as the last entry.
+        :return: None
+        """
+        if self.cards[0].rank != "A":
+            return
+        for player in player_list[0:-1]:
+            player.insurance = min(player.insure(), player.bet // 2)
+
     def call(self):
         """
         This method forces the dealer to deal cards to himself until the
@@ -233,14 +668,31 @@ class Dealer(Player):
         :return: (str) Clue to himself - to hit if hand score is less than 17,
         else stay
         """
+        if self.headless:
+            return self.decide()
         print("{} is Playing..".format(self.name))
-        time.sleep(1.5)
-        if self.score < 17:
-            clear_prev_lines(1)
-            return 'h'
-        else:
-            clear_prev_lines(1)
-            return 's'
+        scheduler.delay("dealer")
+        clear_prev_lines(1)
+        return self.decide()
+
+    async def acall(self, pacing=scheduler):
+        """
+        This coroutine takes the dealer's decision after the same delay as
+        call(), without blocking the event loop
+        :param pacing: (class Pacing) scheduler of the delays
+        :return: (str) 'h' if hand score is less than 17, else 's'
+        """
+        await pacing.adelay("dealer")
+        return self.decide()
+
+    def decide(self):
+        """
+        This method contains the house rule of the dealer without any
+        terminal output: hit below 17, else stay (and hit a soft 17 if the
+        rules say so)
+        :return: (str) 'h' if hand score is less than 17, else 's'
+        """
+        return 'h' if self.rules.dealer_hits[self.hand] else 's'
 
     def flip_card_up(self):
         """
@@ -248,8 +700,13 @@ class Dealer(Player):
         the players have finished their turns
         :return: None
         """
-        self.cards[-1].up = True
+        self.cards[-1] = self.cards[-1].flipped()
         self.update_score(self.cards[-1])
+        if self.deck.counter is not None:
+            self.deck.counter.see(self.cards[-1].code)
+        if self.log is not None:
+            self.log.record(self.id, events.flip, self.cards[-1].code,
+                            self.score)
 
     def collect(self, player):
         """
@@ -258,8 +715,10 @@ class Dealer(Player):
         :param player: (class Player) The player whose cards are collected by the dealer
         :return: None
         """
-        self.deck._cards.extend(player.cards)
+        self.deck.put_cards(player.cards)
         player.cards.clear()
+        for hand in player.finished:
+            self.deck.put_cards(hand[0])
 
     def update_status(self):
         """
@@ -0,0 +1,111 @@
+import sys
+
+# Terminal renderer keeping a model of the lines it drew. A frame is compared
+# with the model line by line, and only the lines that changed are rewritten,
+# all of them in a single write to the terminal. The lines are addressed
+# relative to the cursor (like tools.overwrite_prev_line), and the cursor is
+# saved and restored around every frame so prompts below stay in place.
+save_cursor = "\0337"
+restore_cursor = "\0338"
+clear_line = "\033[2K"
+
+
+class Renderer:
+
+    def __init__(self, spacing=1, stream=None):
+        """
+        Class Renderer - draws frames of lines on the terminal, rewriting
+        only the lines that changed since the previous frame. Attributes:
+        lines = (list(str)) the lines currently on the screen
+        spacing = (int) number of terminal rows between two lines
+        writes = (int) number of writes to the terminal so far
+        :param spacing: (int) number of terminal rows between two lines
+        :param stream: stream written to (sys.stdout by default)
+        """
+        self.lines = []
+        self.spacing = spacing
+        self.stream = stream
+        self.writes = 0
+
+    def sync(self, lines):
+        """
+        This method records lines printed by other means as the content of
+        the screen, without drawing anything
+        :param lines: (list(str)) the lines on the screen
+        :return: None
+        """
+        self.lines = list(lines)
+
+    def diff(self, lines, below=0):
+        """
+        This method computes the terminal output turning the current screen
+        into 'lines'
+        :param lines: (list(str)) the new lines
+        :param below: (int) number of rows between the last line and the
+        cursor
+        :return: (str) output to be written, empty if nothing changed
+        """
+        previous = self.lines
+        count = len(lines)
+        parts = []
+        for index, line in enumerate(lines):
+            if index < len(previous) and previous[index] == line:
+                continue
+            up = below + (count - 1 - index) * self.spacing
+            parts.append("\033[{}F{}{}".format(up, clear_line, line)
+                         if up else "\r" + clear_line + line)
+        if not parts:
+            return ""
+        return save_cursor + "".join(parts) + restore_cursor
+
+    def render(self, lines, below=0):
+        """
+        This method draws a frame, rewriting the lines that changed in a
+        single write
+        :param lines: (list(str)) the new lines
+        :param below: (int) number of rows between the last line and the
+        cursor
+        :return: (int) number of characters written
+        """
+        output = self.diff(lines, below)
+        self.lines = list(lines)
+        if output:
+            stream = self.stream or sys.stdout
+            stream.write(output)
+            stream.flush()
+            self.writes += 1
+        return len(output)
+
+    def render_line(self, index, line, below=0):
+        """
+        This method rewrites a single line of the current frame, without
+        comparing the other lines (for tables with many players, where only
+        the player who just played changed)
+        :param index: (int) index of the line in the frame
+        :param line: (str) the new line
+        :param below: (int) number of rows between the last line and the
+        cursor
+        :return: (int) number of characters written
+        """
+        lines = self.lines
+        if index >= len(lines) or lines[index] == line:
+            return 0
+        lines[index] = line
+        up = below + (len(lines) - 1 - index) * self.spacing
+        output = (save_cursor + ("\033[{}F".format(up) if up else "\r") +
+                  clear_line + line + restore_cursor)
+        stream = self.stream or sys.stdout
+        stream.write(output)
+        stream.flush()
+        self.writes += 1
+        return len(output)
+
+    def render_table(self, table, below=0):
+        """
+        This method draws the players of a table, one line per player
+        :param table: (list(class Player)) the players, dealer included
+        :param below: (int) number of rows between the last player and the
+        cursor
+        :return: (int) number of characters written
+        """
+        return self.render([repr(player) for player in table], below)
@@ -0,0 +1,339 @@
+import ast
+import csv
+import math
+import os
+import struct
+from array import array
+from hand import hand_blackjack
+from rules import hand_result
+
+# Results pipeline: the outcome of every hand in every round (split hands
+# included, one row per hand) is appended
+# to columns held in compact arrays, and every 'chunk_rows' rows the columns
+# are written to disk as a chunk, either a CSV file or one NumPy .npy file
+# per column (written with the standard library, readable with numpy.load).
+# Running statistics are kept alongside with Welford's algorithm, so memory
+# stays constant whatever the number of rounds.
+chunk_rows = 1 << 16  # rows per chunk
+columns = [
+    ("round", 'I'),
+    ("player", 'H'),
+    ("threshold", 'b'),  # -1 for players without a threshold
+    ("upcard", 'B'),  # rank index of the dealer's face up card
+    ("dealer_score", 'B'),
+    ("score", 'B'),
+    ("bust", 'B'),
+    ("blackjack", 'B'),
+    ("outcome", 'b'),  # 1 win, 0 push, -1 loss against the dealer
+]
+npy_types = {'I': "<u4", 'H': "<u2", 'B': "|u1", 'b': "|i1"}
+npy_magic = b"\x93NUMPY\x01\x00"
+
+
+class RunningStats:
+
+    def __init__(self):
+        """
+        Class RunningStats - count, mean and variance of a stream of values,
+        updated in constant memory (Welford's algorithm). Attributes:
+        count = (int) number of values
+        mean = (float) mean of the values
+        m2 = (float) sum of the squared differences from the mean
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        """
+        This method adds a value to the statistics
+        :param value: (float) the value
+        :return: None
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        """
+        This method adds the values of other statistics (for results
+        gathered in several processes)
+        :param other: (class RunningStats) statistics to be merged in
+        :return: None
+        """
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        """
+        The sample variance of the values
+        :return: (float) variance, 0 with fewer than two values
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def summary(self):
+        """
+        This method summarises the statistics
+        :return: (dict) count, mean, variance and standard error of the mean
+        """
+        return {"count": self.count, "mean": self.mean,
+                "variance": self.variance,
+                "stderr": math.sqrt(self.variance / self.count)
+                if self.count else 0.0}
+
+
+class OutcomeStats:
+
+    def __init__(self):
+        """
+        Class OutcomeStats - running statistics of the hands of a player (or
+        of a group of players). Attributes:
+        wins, pushes, losses, busts, blackjacks = (int) number of hands
+        score = (class RunningStats) final scores
+        result = (class RunningStats) outcomes (1, 0 or -1), whose mean is
+        the expected result of a hand
+        """
+        self.wins = 0
+        self.pushes = 0
+        self.losses = 0
+        self.busts = 0
+        self.blackjacks = 0
+        self.score = RunningStats()
+        self.result = RunningStats()
+
+    def add(self, score, bust, blackjack, result):
+        """
+        This method adds a hand to the statistics
+        :param score: (int) final score
+        :param bust: (bool) whether the hand went bust
+        :param blackjack: (bool) whether the hand is a blackjack
+        :param result: (int) 1 win, 0 push, -1 loss
+        :return: None
+        """
+        if result > 0:
+            self.wins += 1
+        elif result < 0:
+            self.losses += 1
+        else:
+            self.pushes += 1
+        self.busts += bust
+        self.blackjacks += blackjack
+        self.score.add(score)
+        self.result.add(result)
+
+    def summary(self):
+        """
+        This method summarises the statistics
+        :return: (dict) counts, win rate, bust rate, and the statistics of
+        the scores and outcomes
+        """
+        hands = self.result.count
+        return {"hands": hands, "wins": self.wins, "pushes": self.pushes,
+                "losses": self.losses, "busts": self.busts,
+                "blackjacks": self.blackjacks,
+                "win_rate": self.wins / hands if hands else 0.0,
+                "bust_rate": self.busts / hands if hands else 0.0,
+                "score": self.score.summary(),
+                "result": self.result.summary()}
+
+
+def write_npy(path, values):
+    """
+    This function writes a column as a NumPy .npy file (format version 1.0)
+    :param path: (str) path of the file
+    :param values: (array) the column
+    :return: None
+    """
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}" \
+        .format(npy_types[values.typecode], len(values))
+    # the header is padded with spaces so the data starts on 64 bytes
+    padding = 64 - (len(npy_magic) + 2 + len(header) + 1) % 64
+    header = header + " " * (padding % 64) + "\n"
+    with open(path, "wb") as npy_file:
+        npy_file.write(npy_magic + struct.pack("<H", len(header)) +
+                       header.encode("latin1"))
+        values.tofile(npy_file)
+
+
+def read_npy(path):
+    """
+    This function reads a column written by write_npy
+    :param path: (str) path of the file
+    :return: (array) the column
+    """
+    typecodes = {descr: typecode for typecode, descr in npy_types.items()}
+    with open(path, "rb") as npy_file:
+        npy_file.read(len(npy_magic))
+        length, = struct.unpack("<H", npy_file.read(2))
+        header = ast.literal_eval(npy_file.read(length).decode("latin1"))
+        values = array(typecodes[header["descr"]])
+        values.frombytes(npy_file.read())
+    return values
+
+
+class ResultWriter:
+
+    def __init__(self, directory, chunk_rows=chunk_rows, file_format="csv"):
+        """
+        Class ResultWriter - streams the outcome of every hand of every
+        round to chunked columnar files and keeps running statistics.
+        Attributes:
+        round = (int) number of rounds recorded
+        rows = (int) number of rows written to disk or buffered
+        chunks = (int) number of chunks written
+        players = (dict) OutcomeStats of every player by id
+        thresholds = (dict) OutcomeStats of the bots by threshold
+        :param directory: (str) directory of the chunks (created if missing)
+        :param chunk_rows: (int) rows per chunk
+        :param file_format: (str) 'csv' for a CSV file per chunk, 'npy' for
+        a directory per chunk with a .npy file per column
+        """
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.file_format = file_format
+        self.round = 0
+        self.rows = 0
+        self.chunks = 0
+        self.players = {}
+        self.thresholds = {}
+        self._columns = [array(typecode) for _, typecode in columns]
+        os.makedirs(directory, exist_ok=True)
+
+    def record_round(self, game):
+        """
+        This method records the outcome of every hand at the end of a round,
+        split hands included, before the cards are collected
+        :param game: (class Game) the game whose round is over
+        :return: None
+        """
+        self.round += 1
+        dealer = game.dealer
+        rules = game.rules
+        upcard = dealer.cards[0].rank_index
+        for player in game.table[:-1]:
+            threshold = getattr(player, "threshold", -1)
+            split = player.hands > 1
+            for _, hand, score, _, gave_up in player.finished:
+                self.record_hand(player.id, threshold, upcard, dealer, hand,
+                                 score, split, gave_up, rules)
+            self.record_hand(player.id, threshold, upcard, dealer,
+                             player.hand, player.score, split,
+                             player.surrendered, rules)
+        if len(self._columns[0]) >= self.chunk_rows:
+            self.flush()
+
+    def record_hand(self, player_id, threshold, upcard, dealer, hand, score,
+                    split, gave_up, rules):
+        """
+        This method appends the row of a final hand and adds it to the
+        running statistics
+        :param player_id: (int) id of the player
+        :param threshold: (int) threshold of the bot, -1 for other players
+        :param upcard: (int) rank index of the dealer's face up card
+        :param dealer: (class Dealer) dealer with a final hand
+        :param hand: (int) state of the hand
+        :param score: (int) score of the hand
+        :param split: (bool) whether the hand comes from a split
+        :param gave_up: (bool) whether the hand was surrendered
+        :param rules: (class CompiledRules) the rules of the game
+        :return: None
+        """
+        (rounds, players, thresholds, upcards, dealer_scores, scores, busts,
+         blackjacks, outcomes) = self._columns
+        bust = score > 21
+        blackjack = hand_blackjack[hand] and not split
+        net = hand_result(rules, hand, score, split, gave_up, dealer)
+        result = (net > 0) - (net < 0)
+        rounds.append(self.round)
+        players.append(player_id)
+        thresholds.append(threshold)
+        upcards.append(upcard)
+        dealer_scores.append(dealer.score)
+        scores.append(score)
+        busts.append(bust)
+        blackjacks.append(blackjack)
+        outcomes.append(result)
+        if player_id not in self.players:
+            self.players[player_id] = OutcomeStats()
+        self.players[player_id].add(score, bust, blackjack, result)
+        if threshold not in self.thresholds:
+            self.thresholds[threshold] = OutcomeStats()
+        self.thresholds[threshold].add(score, bust, blackjack, result)
+        self.rows += 1
+
+    def flush(self):
+        """
+        This method writes the buffered rows to disk as a new chunk
+        :return: None
+        """
+        if not self._columns[0]:
+            return
+        name = os.path.join(self.directory, "chunk_{:06d}".format(self.chunks))
+        if self.file_format == "npy":
+            os.makedirs(name, exist_ok=True)
+            for (column, _), values in zip(columns, self._columns):
+                write_npy(os.path.join(name, column + ".npy"), values)
+        else:
+            with open(name + ".csv", "w", newline="") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow([column for column, _ in columns])
+                writer.writerows(zip(*self._columns))
+        self.chunks += 1
+        for values in self._columns:
+            del values[:]
+
+    def close(self):
+        """
+        This method writes the last rows to disk
+        :return: None
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def summary(self):
+        """
+        This method summarises the running statistics
+        :return: (dict) number of 'rounds' and 'rows', and the statistics of
+        every player by id and of the bots by threshold
+        """
+        return {"rounds": self.round, "rows": self.rows,
+                "players": {player_id: stats.summary()
+                            for player_id, stats in self.players.items()},
+                "thresholds": {threshold: stats.summary()
+                               for threshold, stats in
+                               sorted(self.thresholds.items())}}
+
+
+def read_chunks(directory):
+    """
+    This function lazily reads the chunks written by a ResultWriter, in
+    either format
+    :param directory: (str) directory of the chunks
+    :return: generator of the chunks, as dictionaries of columns by name
+    """
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".csv"):
+            with open(path, newline="") as csv_file:
+                reader = csv.reader(csv_file)
+                header = next(reader)
+                chunk = [array(typecode) for _, typecode in columns]
+                for row in reader:
+                    for values, field in zip(chunk, row):
+                        values.append(int(field))
+            yield dict(zip(header, chunk))
+        elif name.startswith("chunk_") and os.path.isdir(path):
+            yield {column: read_npy(os.path.join(path, column + ".npy"))
+                   for column, _ in columns}
@@ -0,0 +1,225 @@
+import random
+from hand import (num_states, decode_state, hand_totals, hand_soft,
+                  hand_blackjack)
+
+# Rule variants. A Rules object describes a variant (dealer hits soft 17,
+# doubles, splits, surrender, insurance, blackjack payout, number of decks)
+# and is compiled once into flat tables indexed by hand state: whether the
+# dealer hits, and the actions a player may take (a bit mask). The round loop
+# only reads these tables, so a variant plays at the speed of the base game.
+can_hit, can_double, can_split, can_surrender = 1, 2, 4, 8
+# results of a hand, index in the payout table of a compiled rule set
+win, push, loss, blackjack, surrendered = range(5)
+
+
+class Rules:
+
+    def __init__(self, decks=None, dealer_hits_soft_17=False,
+                 double_down=False, double_totals=None,
+                 double_after_split=False, max_hands=1, resplit_aces=False,
+                 hit_split_aces=False, surrender=False, insurance=False,
+                 peek=False, blackjack_pays=(3, 2)):
+        """
+        Class Rules - a variant of the rules of blackjack. The defaults are
+        the rules of the original game: hit or stand only, the dealer stands
+        on every 17 and plays even with a blackjack. Attributes:
+        decks = (int) number of decks in the shoe, None for one deck for
+        every 6 players (larger tables get a deck for every 6 players
+        whatever the number)
+        dealer_hits_soft_17 = (bool) the dealer hits a soft 17 (H17)
+        double_down = (bool) players may double on their first two cards
+        double_totals = (tuple(int)) totals players may double on, None for
+        any total
+        double_after_split = (bool) players may double after a split
+        max_hands = (int) hands a player may split into (1 for no splits)
+        resplit_aces = (bool) split aces may be split again
+        hit_split_aces = (bool) split aces may be hit (otherwise they get
+        one card each)
+        surrender = (bool) players may give up half their bet instead of
+        playing their first two cards (late surrender)
+        insurance = (bool) players are offered insurance against a dealer
+        ace, paying 2:1
+        peek = (bool) the dealer checks for blackjack before the players
+        play, who then lose their original bet only
+        blackjack_pays = (tuple(int)) payout of a blackjack, 3:2 or 6:5
+        :param decks, dealer_hits_soft_17, ...: see the attributes
+        """
+        self.decks = decks
+        self.dealer_hits_soft_17 = dealer_hits_soft_17
+        self.double_down = double_down
+        self.double_totals = double_totals
+        self.double_after_split = double_after_split
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+        self.surrender = surrender
+        self.insurance = insurance
+        self.peek = peek
+        self.blackjack_pays = blackjack_pays
+
+    def key(self):
+        """
+        This method identifies the variant
+        :return: (tuple) the value of every rule
+        """
+        return tuple(sorted(vars(self).items()))
+
+    def compile(self):
+        """
+        This method compiles the variant into lookup tables, once per
+        variant
+        :return: (class CompiledRules) the tables of the variant
+        """
+        key = self.key()
+        if key not in compiled:
+            compiled[key] = CompiledRules(self)
+        return compiled[key]
+
+
+compiled = {}  # compiled rule sets by Rules.key()
+
+
+class CompiledRules:
+
+    def __init__(self, rules):
+        """
+        Class CompiledRules - the tables of a rule variant. Attributes:
+        variant = (class Rules) the variant the tables are compiled from
+        decks = (int) number of decks, None for one for every 6 players
+        dealer_hits = (bytearray) 1 if the dealer hits the hand state
+        actions = (bytearray) actions allowed on a hand state (bit mask of
+        can_hit, can_double and can_surrender)
+        split_actions = (bytearray) actions allowed on a split hand
+        split_limit = (int) hands a pair can be split into
+        ace_split_limit = (int) hands a pair of aces can be split into
+        split_ace_hits = (bool) split aces may be hit
+        insurance = (bool) insurance is offered against a dealer ace
+        peek = (bool) the dealer checks for blackjack before the players
+        payouts = (tuple(float)) net result per unit bet of a win, push,
+        loss, blackjack and surrender
+        :param rules: (class Rules) the variant
+        """
+        self.variant = rules
+        self.decks = rules.decks
+        self.dealer_hits = bytearray(num_states)
+        self.actions = bytearray(num_states)
+        self.split_actions = bytearray(num_states)
+        for state in range(num_states):
+            total = hand_totals[state]
+            soft = hand_soft[state]
+            self.dealer_hits[state] = total < 17 or (
+                total == 17 and soft and rules.dealer_hits_soft_17)
+            if total >= 21:
+                continue
+            first_two = decode_state(state)[2] == 2
+            double = first_two and rules.double_down and (
+                rules.double_totals is None or total in rules.double_totals)
+            self.actions[state] = (can_hit | (can_double if double else 0) |
+                                   (can_surrender if first_two and
+                                    rules.surrender else 0))
+            self.split_actions[state] = can_hit | (
+                can_double if double and rules.double_after_split else 0)
+        self.split_limit = max(rules.max_hands, 1)
+        self.ace_split_limit = self.split_limit if rules.resplit_aces else \
+            min(self.split_limit, 2)
+        self.split_ace_hits = rules.hit_split_aces
+        self.insurance = rules.insurance
+        self.peek = rules.peek
+        numerator, denominator = rules.blackjack_pays
+        self.payouts = (1.0, 0.0, -1.0, numerator / denominator, -0.5)
+
+
+# common variants
+classic = Rules()
+rule_sets = {
+    "classic": classic,
+    "vegas_strip": Rules(decks=4, double_down=True, double_after_split=True,
+                         max_hands=4, surrender=True, insurance=True,
+                         peek=True),
+    "downtown": Rules(decks=2, dealer_hits_soft_17=True, double_down=True,
+                      double_after_split=True, max_hands=4, insurance=True,
+                      peek=True),
+    "european": Rules(decks=6, double_down=True, double_totals=(9, 10, 11),
+                      max_hands=2, insurance=True),
+    "six_five": Rules(decks=1, dealer_hits_soft_17=True, double_down=True,
+                      max_hands=4, insurance=True, peek=True,
+                      blackjack_pays=(6, 5)),
+}
+
+
+def hand_result(rules, hand, score, split, gave_up, dealer):
+    """
+    This function compares a hand with the dealer's final hand
+    :param rules: (class CompiledRules) the rules of the game
+    :param hand: (int) state of the hand
+    :param score: (int) score of the hand
+    :param split: (bool) whether the hand comes from a split (a split 21 is
+    not a blackjack)
+    :param gave_up: (bool) whether the hand was surrendered
+    :param dealer: (class Dealer) dealer with a final hand
+    :return: (float) net result per unit bet
+    """
+    payouts = rules.payouts
+    if gave_up:
+        return payouts[surrendered]
+    dealer_blackjack = hand_blackjack[dealer.hand]
+    if hand_blackjack[hand] and not split:
+        return payouts[push] if dealer_blackjack else payouts[blackjack]
+    if score > 21 or dealer_blackjack:
+        return payouts[loss]
+    if dealer.score > 21 or score > dealer.score:
+        return payouts[win]
+    return payouts[push] if score == dealer.score else payouts[loss]
+
+
+def settle(rules, player, dealer):
+    """
+    This function computes the net result of a player's bets at the end of
+    a round: every hand (split hands included) and the insurance
+    :param rules: (class CompiledRules) the rules of the game
+    :param player: (class Player) player with bets and final hands
+    :param dealer: (class Dealer) dealer with a final hand
+    :return: (float) chips won (negative if lost)
+    """
+    split = player.hands > 1
+    total = player.bet * hand_result(rules, player.hand, player.score, split,
+                                     player.surrendered, dealer)
+    for _, hand, score, bet, gave_up in player.finished:
+        total += bet * hand_result(rules, hand, score, split, gave_up, dealer)
+    if player.insurance:
+        total += player.insurance * (2 if hand_blackjack[dealer.hand] else -1)
+    return total
+
+
+def house_edge(rules, rounds, computer_players=1, seed=0, bot_class=None):
+    """
+    This function measures the house edge of a variant against bots, over
+    many headless rounds with a unit bet per hand
+    :param rules: (class Rules) the variant
+    :param rounds: (int) number of rounds to be played
+    :param computer_players: (int) number of bots at the table
+    :param seed: (int) seed of the simulation
+    :param bot_class: class of the bots (ComputerPlayer by default)
+    :return: (dict) number of 'hands', units 'wagered' and 'won' by the
+    bots, and the house 'edge' (won by the house per unit wagered)
+    """
+    from blackjack import Game  # blackjack imports this module
+    from player import ComputerPlayer
+    game = Game(0, computer_players, headless=True, rng=random.Random(seed),
+                bot_class=bot_class or ComputerPlayer, rules=rules)
+    game.seat_players()
+    players = game.table[:-1]
+    compiled_rules = game.rules
+    hands = wagered = won = 0
+    for _ in range(rounds):
+        for player in players:
+            player.bet = 1
+        game.play_round()
+        for player in players:
+            won += settle(compiled_rules, player, game.dealer)
+            hands += player.hands
+            wagered += player.bet + player.insurance + sum(
+                hand[3] for hand in player.finished)
+        game.reset_round()
+    return {"rounds": rounds, "hands": hands, "wagered": wagered, "won": won,
+            "edge": -won / wagered if wagered else 0.0}
@@ -0,0 +1,346 @@
+import asyncio
+import sys
+from async_game import AsyncTable
+from player import HumanPlayer
+from events import event_names, hole, no_card
+
+# Multi-table game server. Clients connect over TCP and talk a line based
+# protocol; every table of the pool runs on the same event loop and is reused
+# from round to round and from client to client.
+#
+# client -> server:
+#   JOIN <name>      take a seat at the first table with a free seat
+#   H / S            hit or stay, when it is the client's turn
+#   QUIT             leave the table
+# server -> client:
+#   WELCOME <table> <player id>
+#   SEAT <player id> <type> <name>     a player sat down at the table
+#   LEAVE <player id>                  a player left the table
+#   ROUND <number>                     a new round starts
+#   <EVENT> <player id> <card> <score> a table event (DEAL, HOLE, HIT, STAY,
+#                                      FLIP, BUST, WINNER, see events.py)
+#   TURN                               the server waits for H or S (a
+#                                      client silent for turn_timeout
+#                                      seconds stays)
+#   BYE
+# Cards are sent as card codes (see deck.Card) and only what changed is sent,
+# the clients keep the table state themselves. The dealer's face down card is
+# sent as no_card with HOLE, and only revealed by FLIP.
+host = "127.0.0.1"
+port = 8021
+seats_per_table = 6  # human seats per table
+turn_timeout = 30  # seconds a client is given for a decision
+
+
+class Client:
+
+    def __init__(self, writer, timeout=turn_timeout):
+        """
+        Class Client - a connection to the server. Attributes:
+        player = (class HumanPlayer) the client's player, once seated
+        table = (class ServerTable) the table the client is seated at
+        actions = (asyncio.Queue) decisions received from the client
+        connected = (bool) False once the client left
+        timeout = (float) seconds the client is given for a decision
+        :param writer: (asyncio.StreamWriter) stream to the client
+        :param timeout: (float) seconds the client is given for a decision
+        """
+        self.writer = writer
+        self.timeout = timeout
+        self.player = None
+        self.table = None
+        self.actions = asyncio.Queue()
+        self.connected = True
+
+    def send(self, line):
+        """
+        This method sends a line to the client, without waiting for it to be
+        written out
+        :param line: (str) message to be sent
+        :return: None
+        """
+        if self.connected:
+            self.writer.write(line.encode() + b"\n")
+
+    async def next_action(self):
+        """
+        This coroutine is the input source of the client's player: it asks
+        the client for a decision and waits for it, so that an idle client
+        does not hold up its table. A client that left or does not answer in
+        time stays.
+        :return: (str) decision sent by the client
+        """
+        while not self.actions.empty():
+            self.actions.get_nowait()
+        if not self.connected:
+            return 's'
+        self.send("TURN")
+        try:
+            return await asyncio.wait_for(self.actions.get(), self.timeout)
+        except asyncio.TimeoutError:
+            return 's'
+
+
+class ServerTable(AsyncTable):
+
+    def __init__(self, table_id, seats=seats_per_table, computer_players=1,
+                 pace=0.5):
+        """
+        Class ServerTable - a table of the server pool, broadcasting its
+        events to the seated clients. Attributes:
+        table_id = (int) number of the table in the pool
+        seats = (int) number of human seats
+        clients = (dict) seated clients by player id
+        waiting = (list(Client)) clients waiting for the current round to end
+        before sitting down
+        round = (int) number of the current round
+        :param table_id: (int) number of the table in the pool
+        :param seats: (int) number of human seats
+        :param computer_players: (int) number of bots at the table
+        :param pace: (float) scale of the animation delays (0 for none)
+        """
+        super().__init__(0, computer_players, pace=pace)
+        self.pacing.bots_only = False
+        self.table_id = table_id
+        self.game.dealer.table_id = table_id
+        self.seats = seats
+        self.clients = {}
+        self.waiting = []
+        self.round = 0
+        self.playing = False
+        self.seated = asyncio.Event()
+        self.next_id = max(player.id for player in self.game.table) + 1
+        self.game.record_events(self)
+
+    @property
+    def free_seats(self):
+        return self.seats - len(self.clients) - len(self.waiting)
+
+    def broadcast(self, line):
+        """
+        This method sends a line to every client seated at the table
+        :param line: (str) message to be sent
+        :return: None
+        """
+        for client in self.clients.values():
+            client.send(line)
+
+    def new_round(self):
+        """
+        This method is called by the game when a round starts (see
+        events.EventWriter)
+        :return: None
+        """
+        self.round += 1
+        self.broadcast("ROUND {}".format(self.round))
+
+    def record(self, player_id, kind, card, score):
+        """
+        This method is called by the game for every event of a round and
+        forwards it to the clients (see events.EventWriter), hiding the
+        dealer's face down card until it is flipped
+        :param player_id: (int) id of the player concerned
+        :param kind: (int) kind of event
+        :param card: (int) code of the card concerned
+        :param score: (int) score of the player after the event
+        :return: None
+        """
+        if kind == hole:
+            card = no_card
+        self.broadcast("{} {} {} {}".format(event_names[kind].upper(),
+                                            player_id, card, score))
+
+    def join(self, client, name):
+        """
+        This method seats a client at the table, in front of the dealer. A
+        client joining during a round sits down when the round ends.
+        :param client: (class Client) client to be seated
+        :param name: (str) name of the client's player
+        :return: None
+        """
+        client.table = self
+        client.player = HumanPlayer(name, headless=True)
+        if self.playing:
+            self.waiting.append(client)
+        else:
+            self.sit_down(client)
+
+    def sit_down(self, client):
+        """
+        This method gives a client its seat and introduces the table to it
+        :param client: (class Client) client to be seated
+        :return: None
+        """
+        player = client.player
+        player.id = self.next_id
+        self.next_id += 1
+        player.input_source = client.next_action
+        self.broadcast("SEAT {} {} {}".format(player.id, player.type,
+                                              player.name))
+        self.clients[player.id] = client
+        self.game.add_players([player])
+        client.send("WELCOME {} {}".format(self.table_id, player.id))
+        for seated in self.game.table:
+            client.send("SEAT {} {} {}".format(seated.id, seated.type,
+                                               seated.name))
+        self.seated.set()
+
+    def leave(self, client):
+        """
+        This method frees the seat of a client. During a round the player
+        stays on every decision and is removed at the end of the round.
+        :param client: (class Client) client leaving the table
+        :return: None
+        """
+        client.connected = False
+        client.actions.put_nowait('s')
+        if client in self.waiting:
+            self.waiting.remove(client)
+        if not self.playing:
+            self.update_seats()
+
+    def update_seats(self):
+        """
+        This method removes the players of the clients that left the table
+        and seats the clients that were waiting for the round to end
+        :return: None
+        """
+        left = {player_id for player_id, client in self.clients.items()
+                if not client.connected}
+        if left:
+            for player_id in left:
+                del self.clients[player_id]
+            self.game.remove_players(left)
+            for player_id in left:
+                self.broadcast("LEAVE {}".format(player_id))
+        for client in self.waiting:
+            self.sit_down(client)
+        self.waiting.clear()
+        if not self.clients:
+            self.seated.clear()
+
+    async def run(self):
+        """
+        This coroutine plays rounds at the table for as long as the server
+        runs, waiting while no client is seated
+        :return: None
+        """
+        while True:
+            await self.seated.wait()
+            self.playing = True
+            try:
+                await self.play_round()
+            finally:
+                self.playing = False
+            self.update_seats()
+
+
+class GameServer:
+
+    def __init__(self, seats=seats_per_table, computer_players=1, pace=0.5,
+                 timeout=turn_timeout):
+        """
+        Class GameServer - hosts a pool of tables. Attributes:
+        tables = (list(ServerTable)) the pool of tables
+        :param seats: (int) number of human seats per table
+        :param computer_players: (int) number of bots per table
+        :param pace: (float) scale of the animation delays (0 for none)
+        :param timeout: (float) seconds a client is given for a decision
+        """
+        self.seats = seats
+        self.computer_players = computer_players
+        self.pace = pace
+        self.timeout = timeout
+        self.tables = []
+        self.tasks = []
+        self.server = None
+
+    def table_for(self):
+        """
+        This method returns a table with a free seat, opening a new table of
+        the pool if all are full
+        :return: (class ServerTable) table with a free seat
+        """
+        for table in self.tables:
+            if table.free_seats > 0:
+                return table
+        table = ServerTable(len(self.tables), self.seats,
+                            self.computer_players, self.pace)
+        self.tables.append(table)
+        self.tasks.append(asyncio.create_task(table.run()))
+        return table
+
+    async def handle(self, reader, writer):
+        """
+        This coroutine serves a connected client until it quits or
+        disconnects
+        :param reader: (asyncio.StreamReader) stream from the client
+        :param writer: (asyncio.StreamWriter) stream to the client
+        :return: None
+        """
+        client = Client(writer, self.timeout)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode().strip().partition(" ")
+                command = command.upper()
+                if command == "JOIN" and client.table is None:
+                    self.table_for().join(client, argument or "Player")
+                elif command in ("H", "S") and client.table is not None:
+                    client.actions.put_nowait(command.lower())
+                elif command == "QUIT":
+                    client.send("BYE")
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if client.table is not None:
+                client.table.leave(client)
+            client.connected = False
+            writer.close()
+
+    async def start(self, host=host, port=port):
+        """
+        This coroutine starts listening for clients
+        :param host: (str) address to listen on
+        :param port: (int) port to listen on (0 for any free port)
+        :return: (tuple) address and port the server listens on
+        """
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """
+        This coroutine stops the server and its tables
+        :return: None
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+async def serve(host=host, port=port, **options):
+    """
+    This coroutine runs a game server until it is cancelled
+    :param host: (str) address to listen on
+    :param port: (int) port to listen on
+    :param options: keyword arguments of GameServer
+    :return: None
+    """
+    game_server = GameServer(**options)
+    address = await game_server.start(host, port)
+    print("Blackjack server listening on {}:{}".format(*address))
+    async with game_server.server:
+        await game_server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(port=int(sys.argv[1]) if len(sys.argv) > 1
+                          else port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,199 @@
+import mmap
+import os
+import struct
+from array import array
+from dealer_odds import (dealer_outcomes, full_shoe, remove_card, shoe_counts,
+                         class_ranks, num_classes)
+from hand import (empty_hand, num_states, num_ranks, transitions, hand_totals,
+                  hand_soft, hand_bust)
+from parallel import run_jobs
+
+# Exact expected values of hitting and standing for every hand state against
+# every dealer face up card, for any shoe composition. Unlike strategy.py,
+# the cards drawn by the player are removed from the shoe before the dealer
+# plays, so the values are exact for the composition. The player's draws are
+# enumerated over value classes with a memo keyed by (state, composition),
+# and the dealer's final distributions come from dealer_odds.dealer_outcomes,
+# whose cache is shared by every state (different draws often leave the same
+# composition). Each face up card is an independent job, run in a pool of
+# worker processes. Tables hold two float32 values per (state, upcard) and
+# are stored in a small file that is memory-mapped when read.
+header = struct.Struct("<4sBHB10H")  # magic, version, states, classes,
+# composition of the shoe the table was solved for
+magic = b"BJEV"
+version = 1
+stand, hit = 0, 1  # value index of each play in a table entry
+
+
+def table_index(state, upcard):
+    """
+    This function returns the position of the values of a hand in a table
+    :param state: (int) state of the player's hand
+    :param upcard: (int) value class of the dealer's face up card
+    :return: (int) index of the stand value, the hit value follows it
+    """
+    return (state * num_classes + upcard) * 2
+
+
+def solve_upcard(job):
+    """
+    This function computes the values of every hand state against one face
+    up card
+    :param job: (tuple) value class of the face up card and composition of
+    the shoe once the face up card is dealt
+    :return: (array) stand and hit values of every state, indexed by
+    state * 2 + play (hit values of hands of 21 or more are their stand
+    values)
+    """
+    upcard, counts = job
+    dealer_state = transitions[empty_hand * num_ranks + class_ranks[upcard]]
+    stand_values = {}
+    best_values = {}
+
+    def stand_value(state, counts):
+        """
+        This function computes the expected value of standing on a hand
+        :param state: (int) state of the player's hand
+        :param counts: (tuple(int)) composition of the shoe
+        :return: (float) expected result of the hand (1 win, -1 loss)
+        """
+        if hand_bust[state]:
+            return -1.0
+        key = hand_totals[state], counts
+        if key not in stand_values:
+            total = hand_totals[state]
+            outcomes = dealer_outcomes(dealer_state, counts)
+            value = outcomes[5]
+            for index in range(5):
+                if index + 17 < total:
+                    value += outcomes[index]
+                elif index + 17 > total:
+                    value -= outcomes[index]
+            stand_values[key] = value
+        return stand_values[key]
+
+    def hit_value(state, counts):
+        """
+        This function computes the expected value of hitting a hand, then
+        playing on the best way
+        :param state: (int) state of the player's hand
+        :param counts: (tuple(int)) composition of the shoe
+        :return: (float) expected result of the hand
+        """
+        cards = sum(counts)
+        value = 0.0
+        for value_class, count in enumerate(counts):
+            if not count:
+                continue
+            following = transitions[state * num_ranks +
+                                    class_ranks[value_class]]
+            if hand_bust[following]:
+                value -= count / cards
+            else:
+                value += count / cards * best_value(
+                    following, remove_card(counts, value_class))
+        return value
+
+    def best_value(state, counts):
+        """
+        This function computes the expected value of the best play
+        :param state: (int) state of the player's hand
+        :param counts: (tuple(int)) composition of the shoe
+        :return: (float) expected result of the hand
+        """
+        total = hand_totals[state]
+        if total >= 21:
+            return stand_value(state, counts)
+        # hands of the same total and softness play the same way
+        key = total, hand_soft[state], counts
+        if key not in best_values:
+            best_values[key] = max(stand_value(state, counts),
+                                   hit_value(state, counts))
+        return best_values[key]
+
+    values = array('f', bytes(num_states * 2 * 4))
+    for state in range(num_states):
+        if state == empty_hand:
+            continue
+        values[state * 2 + stand] = value = stand_value(state, counts)
+        if not hand_bust[state] and hand_totals[state] < 21:
+            value = hit_value(state, counts)
+        values[state * 2 + hit] = value
+    return values
+
+
+def solve(counts=None, workers=1):
+    """
+    This function computes the values of every hand state against every
+    dealer face up card
+    :param counts: (tuple(int)) composition of the shoe before the face up
+    card is dealt (see dealer_odds.shoe_counts), or a Deck, a full deck by
+    default
+    :param workers: (int) number of worker processes (None for one per core)
+    :return: (array) stand and hit values, see table_index (the values
+    against a face up card missing from the shoe are 0)
+    """
+    if counts is None:
+        counts = full_shoe()
+    elif not isinstance(counts, tuple):
+        counts = shoe_counts(counts)
+    upcards = [upcard for upcard in range(num_classes) if counts[upcard]]
+    results = run_jobs(solve_upcard,
+                       [(upcard, remove_card(counts, upcard))
+                        for upcard in upcards], workers)
+    table = array('f', bytes(num_states * num_classes * 2 * 4))
+    for upcard, values in zip(upcards, results):
+        for state in range(num_states):
+            index = table_index(state, upcard)
+            table[index:index + 2] = values[state * 2:state * 2 + 2]
+    return table
+
+
+def decisions(table):
+    """
+    This function turns a table of values into hit/stand decisions, in the
+    format of the basic strategy tables (see strategy.build_table)
+    :param table: (array or memoryview) values computed by solve
+    :return: (bytearray) 1 for hit and 0 for stand, indexed by
+    state * num_classes + upcard value class
+    """
+    return bytearray(table[index + hit] > table[index + stand]
+                     for index in range(0, len(table), 2))
+
+
+def save_values(table, counts, path):
+    """
+    This function writes a table of values to disk
+    :param table: (array) values computed by solve
+    :param counts: (tuple(int)) composition the table was solved for
+    :param path: (str) file to write
+    :return: None
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as table_file:
+        table_file.write(header.pack(magic, version, num_states, num_classes,
+                                     *counts))
+        table_file.write(table.tobytes())
+    os.replace(temp_path, path)
+
+
+def map_values(path):
+    """
+    This function memory-maps a table of values from disk
+    :param path: (str) file to read
+    :return: (tuple) composition the table was solved for and the values
+    (memoryview of floats), None if the file is missing or invalid
+    """
+    try:
+        with open(path, "rb") as table_file:
+            mapped = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    fields = header.unpack_from(mapped) if len(mapped) >= header.size \
+        else None
+    if fields is None or fields[:4] != (magic, version, num_states,
+                                        num_classes) or \
+            len(mapped) != header.size + num_states * num_classes * 2 * 4:
+        mapped.close()
+        return None
+    return tuple(fields[4:]), memoryview(mapped)[header.size:].cast('f')
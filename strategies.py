@@ -0,0 +1,296 @@
+import random
+from abc import ABC, abstractmethod
+from array import array
+from functools import lru_cache
+from dealer_odds import rank_classes, num_classes
+from hand import num_states, decode_state, hand_totals, hand_soft
+from player import ComputerPlayer
+from rules import can_double, can_split, can_surrender
+from strategy import basic_strategy
+
+# Strategy plugins. A strategy is a class registered by name, whose decide()
+# method takes the pending decisions of many hands at once, as a read-only
+# DecisionView of compact arrays (hand states, dealer upcards and allowed
+# actions), and returns one decision code per hand. Headless games ask every
+# strategy once per pass over the bots still playing (see Game.play_batched)
+# and batch simulations once per pass over the rounds of a batch (see
+# batch.py), so the cost of a Python call is paid per batch, not per hit.
+#
+#     @register("never_bust")
+#     class NeverBust(Strategy):
+#         def decide(self, view):
+#             return bytes([hand_totals[hand] < 12 for hand in view.hands])
+#
+# decision codes returned by the strategies, and the matching key of each
+# code as understood by Dealer.respond
+stand, hit, double, split, surrender = range(5)
+decision_keys = "shdpr"
+registry = {}  # strategy classes by name
+
+
+def register(name):
+    """
+    This function registers a strategy class under a name (class decorator)
+    :param name: (str) name of the strategy
+    :return: decorator returning the class unchanged
+    """
+    def decorator(strategy_class):
+        registry[name] = strategy_class
+        strategy_class.name = name
+        return strategy_class
+    return decorator
+
+
+def create_strategy(name, *args):
+    """
+    This function creates a strategy by name
+    :param name: (str) name of a registered strategy
+    :param args: parameters of the strategy (e.g. the threshold)
+    :return: (class Strategy) the strategy
+    """
+    if name not in registry:
+        raise ValueError("Unknown strategy {}, registered strategies: {}"
+                         .format(name, ", ".join(sorted(registry))))
+    return registry[name](*args)
+
+
+@lru_cache(maxsize=None)
+def shared_strategy(name, *args):
+    """
+    This function returns a strategy shared by every bot with the same
+    parameters, so that their decisions are taken in the same batch
+    :param name: (str) name of a registered strategy
+    :param args: parameters of the strategy
+    :return: (class Strategy) the strategy
+    """
+    return create_strategy(name, *args)
+
+
+class DecisionView:
+
+    def __init__(self, hands, upcards, actions, ids):
+        """
+        Class DecisionView - read-only view of pending decisions, one entry
+        per hand. Attributes:
+        hands = (memoryview) state of every hand (see hand.py)
+        upcards = (memoryview) value class of the dealer's face up card (0
+        to 7 for 2 to 9, 8 for ten-valued cards and 9 for aces)
+        actions = (memoryview) actions the rules allow on every hand (bit
+        mask, see rules.py)
+        ids = (memoryview) id of the player of every hand (round index in a
+        batch simulation)
+        :param hands: (array('B')) hand states
+        :param upcards: (array('B')) upcard value classes
+        :param actions: (array('B')) allowed actions
+        :param ids: (array('I')) player ids
+        """
+        self.hands = memoryview(hands).toreadonly()
+        self.upcards = memoryview(upcards).toreadonly()
+        self.actions = memoryview(actions).toreadonly()
+        self.ids = memoryview(ids).toreadonly()
+
+    def __len__(self):
+        """
+        Returns the number of pending decisions
+        :return: (int) number of hands
+        """
+        return len(self.hands)
+
+    @classmethod
+    def of_players(cls, players):
+        """
+        This method builds the view of the current hands of players, whose
+        actions were offered by the dealer (see Dealer.offer)
+        :param players: (list(class Player)) players about to decide
+        :return: (class DecisionView) the view
+        """
+        return cls(array('B', [player.hand for player in players]),
+                   array('B', [rank_classes[player.upcard.rank_index]
+                               for player in players]),
+                   array('B', [player.actions for player in players]),
+                   array('I', [player.id for player in players]))
+
+
+class Strategy(ABC):
+    name = "strategy"  # registered name, set by register
+
+    def parameters(self):
+        """
+        This method returns the parameters the strategy was created with
+        (see create_strategy), none by default
+        :return: (tuple) the parameters
+        """
+        return ()
+
+    @property
+    def label(self):
+        """
+        The name of the strategy with its parameters, e.g. threshold(15)
+        :return: (str) label of the strategy
+        """
+        return "{}({})".format(self.name, ", ".join(
+            str(parameter) for parameter in self.parameters()))
+
+    @abstractmethod
+    def decide(self, view):
+        """
+        This method takes the decisions of a batch of hands. Decisions on
+        actions the rules do not allow are taken as stand.
+        :param view: (class DecisionView) pending decisions
+        :return: (bytes-like) decision code of every hand (stand, hit,
+        double, split or surrender)
+        """
+
+
+@register("threshold")
+class ThresholdStrategy(Strategy):
+
+    def __init__(self, threshold=16):
+        """
+        Class ThresholdStrategy - the rule of ComputerPlayer: take the
+        actions of the rule variants it likes (see
+        ComputerPlayer.variant_decision), else hit below the threshold. The
+        rule is compiled into a table indexed by actions, hand state and
+        upcard. Attributes:
+        threshold = (int) score from which the bot stays
+        table = (bytes) decision code of every entry
+        :param threshold: (int) score from which the bot stays
+        """
+        self.threshold = int(threshold)
+        table = bytearray((can_surrender << 1) * num_states * num_classes)
+        for state in range(num_states):
+            total = hand_totals[state]
+            hard, ace, _ = decode_state(state)
+            # a hand that may be split is a pair, told apart by its total
+            pair = (ace and hard == 2) or (not ace and hard == 16)
+            default = hit if total < self.threshold else stand
+            for actions in range(can_surrender << 1):
+                start = (actions * num_states + state) * num_classes
+                for upcard in range(num_classes):
+                    upcard_value = upcard + 2
+                    decision = default
+                    if actions & can_split and pair:
+                        decision = split
+                    elif hand_soft[state]:
+                        pass
+                    elif (actions & can_surrender and total == 16 and
+                          upcard_value >= 10):
+                        decision = surrender
+                    elif (actions & can_double and total in (10, 11) and
+                          upcard_value < total):
+                        decision = double
+                    table[start + upcard] = decision
+        self.table = bytes(table)
+
+    def parameters(self):
+        """
+        This method returns the parameters of the strategy
+        :return: (tuple) the threshold
+        """
+        return self.threshold,
+
+    def decide(self, view):
+        """
+        This method looks the decisions up in the compiled table
+        :param view: (class DecisionView) pending decisions
+        :return: (bytes) decision code of every hand
+        """
+        table = self.table
+        return bytes([table[(actions * num_states + hand) * num_classes +
+                            upcard]
+                      for hand, upcard, actions in
+                      zip(view.hands, view.upcards, view.actions)])
+
+
+@register("basic")
+class BasicStrategy(Strategy):
+
+    def __init__(self, decks=1):
+        """
+        Class BasicStrategy - hit or stand by the basic strategy table (see
+        strategy.py). Attributes:
+        decks = (int) number of decks the strategy is computed for
+        table = (memoryview) basic strategy decisions (1 for hit)
+        :param decks: (int) number of decks the strategy is computed for
+        """
+        self.decks = int(decks)
+        self.table = basic_strategy(self.decks)
+
+    def __reduce__(self):
+        """
+        This method pickles the strategy by its number of decks (the table
+        is memory-mapped), for worker processes
+        :return: (tuple) class and arguments rebuilding the strategy
+        """
+        return BasicStrategy, (self.decks,)
+
+    def parameters(self):
+        """
+        This method returns the parameters of the strategy
+        :return: (tuple) the number of decks
+        """
+        return self.decks,
+
+    def decide(self, view):
+        """
+        This method looks the decisions up in the basic strategy table
+        :param view: (class DecisionView) pending decisions
+        :return: (bytes) decision code of every hand
+        """
+        table = self.table
+        return bytes([table[hand * num_classes + upcard]
+                      for hand, upcard in zip(view.hands, view.upcards)])
+
+
+def decide_batch(players):
+    """
+    This function takes the decisions of players with a strategy, calling
+    every strategy once for all of its players
+    :param players: (list(class StrategyPlayer)) players about to decide
+    :return: (list(str)) decision of every player ('h', 's', 'd', 'p' or
+    'r', see Dealer.respond)
+    """
+    groups = {}
+    for index, player in enumerate(players):
+        groups.setdefault(player.current_strategy(), []).append(index)
+    decisions = [None] * len(players)
+    for strategy, indices in groups.items():
+        codes = strategy.decide(DecisionView.of_players(
+            [players[index] for index in indices]))
+        for index, code in zip(indices, codes):
+            decisions[index] = decision_keys[code]
+    return decisions
+
+
+class StrategyPlayer(ComputerPlayer):
+    def __init__(self, name, headless=False, rng=random, strategy=None):
+        """
+        This class creates a bot playing a strategy plugin. Headless games
+        take the decisions of all their strategy bots in batches (see
+        Game.play_batched), otherwise the bot decides alone.
+        strategy = (class Strategy) strategy of the bot, None for the
+        threshold rule with the bot's threshold
+        :param name: (str) default name assigned by the game
+        :param headless: (bool) skip the name prompt and the simulated
+        thinking delays if True
+        :param rng: (random.Random) random number generator of the bot
+        :param strategy: (class Strategy) strategy of the bot
+        """
+        super().__init__(name, headless, rng)
+        self.strategy = strategy
+
+    def current_strategy(self):
+        """
+        This method returns the strategy the bot plays
+        :return: (class Strategy) the strategy
+        """
+        if self.strategy is None:
+            return shared_strategy("threshold", self.threshold)
+        return self.strategy
+
+    def decide(self):
+        """
+        This method asks the bot's strategy for a single decision
+        :return: (str) Decision of the bot ('h', 's', 'd', 'p' or 'r')
+        """
+        return decide_batch([self])[0]
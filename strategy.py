@@ -0,0 +1,147 @@
+import mmap
+import os
+import struct
+from functools import lru_cache
+from dealer_odds import (dealer_distribution, full_shoe, remove_card,
+                         class_ranks, num_classes)
+from hand import num_states, num_ranks, transitions, hand_totals, hand_bust
+
+# Basic strategy: the hit/stand decision with the highest expected value for
+# every hand state against every dealer face up card. Decisions are stored as
+# one byte (1 for hit) at index state * num_classes + upcard value class, in a
+# small file next to this module that is memory-mapped on first use, so the
+# table is only computed once per number of decks.
+table_directory = os.path.dirname(os.path.abspath(__file__))
+header = struct.Struct("<4sBBHB")  # magic, version, decks, states, classes
+magic = b"BJST"
+version = 1
+
+
+def table_path(decks):
+    """
+    This function returns the path of the strategy table for 'decks' decks
+    :param decks: (int) number of decks in the shoe
+    :return: (str) path of the table file
+    """
+    return os.path.join(table_directory,
+                        "basic_strategy_{}.bin".format(decks))
+
+
+def stand_value(total, dealer):
+    """
+    This function computes the expected value of standing on 'total'
+    :param total: (int) score of the player's hand
+    :param dealer: (dict) distribution of the dealer's final score
+    :return: (float) expected result of the hand (1 win, -1 loss)
+    """
+    if total > 21:
+        return -1.0
+    value = dealer["bust"]
+    for score in range(17, 22):
+        if score < total:
+            value += dealer[score]
+        elif score > total:
+            value -= dealer[score]
+    return value
+
+
+def build_table(decks=1):
+    """
+    This function computes the basic strategy decisions by expected value.
+    The dealer's distribution is exact for the shoe without the face up
+    card, the player's draws use the same composition.
+    :param decks: (int) number of decks in the shoe
+    :return: (bytearray) 1 for hit and 0 for stand, indexed by
+    state * num_classes + upcard value class
+    """
+    table = bytearray(num_states * num_classes)
+    for upcard in range(num_classes):
+        counts = remove_card(full_shoe(decks), upcard)
+        dealer = dealer_distribution(upcard, counts)
+        cards = sum(counts)
+        draws = [(count / cards, class_ranks[value_class])
+                 for value_class, count in enumerate(counts) if count]
+        best = {}
+
+        def best_value(state):
+            """
+            This function returns the expected value of the best play from
+            'state', recording the decision in the table
+            :param state: (int) state of the player's hand
+            :return: (float) expected value of the best play
+            """
+            if state in best:
+                return best[state]
+            total = hand_totals[state]
+            stand = stand_value(total, dealer)
+            if hand_bust[state] or total >= 21:
+                best[state] = stand
+                return stand
+            hit = sum(weight * best_value(transitions[state * num_ranks +
+                                                      rank])
+                      for weight, rank in draws)
+            table[state * num_classes + upcard] = hit > stand
+            best[state] = max(hit, stand)
+            return best[state]
+
+        for state in range(num_states):
+            best_value(state)
+    return table
+
+
+def save_table(table, decks, path=None):
+    """
+    This function writes a strategy table to disk
+    :param table: (bytearray) decisions (see build_table)
+    :param decks: (int) number of decks the table was built for
+    :param path: (str) file to write, defaults to table_path(decks)
+    :return: None
+    """
+    path = path or table_path(decks)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as table_file:
+        table_file.write(header.pack(magic, version, decks, num_states,
+                                     num_classes))
+        table_file.write(table)
+    os.replace(temp_path, path)
+
+
+def map_table(decks, path=None):
+    """
+    This function memory-maps a strategy table from disk
+    :param decks: (int) number of decks the table was built for
+    :param path: (str) file to read, defaults to table_path(decks)
+    :return: (memoryview) decisions, or None if the file is missing or was
+    written for other settings
+    """
+    path = path or table_path(decks)
+    try:
+        with open(path, "rb") as table_file:
+            mapped = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) != header.size + num_states * num_classes or \
+            header.unpack_from(mapped) != (magic, version, decks, num_states,
+                                           num_classes):
+        mapped.close()
+        return None
+    return memoryview(mapped)[header.size:]
+
+
+@lru_cache(maxsize=None)
+def basic_strategy(decks=1):
+    """
+    This function returns the strategy table for 'decks' decks, computing
+    and saving it the first time it is requested
+    :param decks: (int) number of decks in the shoe
+    :return: (memoryview or bytearray) decisions (see build_table)
+    """
+    table = map_table(decks)
+    if table is None:
+        table = build_table(decks)
+        try:
+            save_table(table, decks)
+        except OSError:
+            return table
+        table = map_table(decks) or table
+    return table
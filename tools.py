@@ -1,5 +1,5 @@
 import sys
-import time
+from pacing import scheduler
 
 
 def readch():
@@ -36,6 +36,16 @@ def readch():
     return _getch()
 
 
+async def async_readch():
+    """
+    This coroutine reads a single key press in a worker thread, so the
+    event loop keeps running while waiting for the user
+    :return: (string) Returns the read raw character
+    """
+    import asyncio  # only imported by the asyncio game loop
+    return await asyncio.get_running_loop().run_in_executor(None, readch)
+
+
 def validate_input(valid_args,
                    welcome_message="What would you like to do?",
                    error_message=" is not a valid input, please try again\n",
@@ -52,17 +62,17 @@ def validate_input(valid_args,
     among valid_args
     :return: (string) read input which is among valid_args
     """
-    time.sleep(0.5)
+    scheduler.delay("input")
     print(welcome_message)
     while True:
         read_value = readch()
         if str.lower(read_value) in valid_args:
             clear_prev_lines(1)
-            time.sleep(0.5)
+            scheduler.delay("input")
             break
         else:
             clear_prev_lines(1)
-            time.sleep(0.5)
+            scheduler.delay("input")
             print(read_value + error_message)
             sys.stdout.flush()
     return read_value
@@ -74,9 +84,7 @@ def move_lines_up(num_lines=0):
     :param num_lines: (int) The number of lines the cursor has to move up by
     :return: None
     """
-    print("\r", end="")
-    for line in range(num_lines):
-        print("\033[F", end="")
+    sys.stdout.write("\r" + "\033[F" * num_lines)
 
 
 def move_lines_down(num_lines=0):
@@ -85,9 +93,7 @@ def move_lines_down(num_lines=0):
     :param num_lines: (int) The number of lines the cursor has to move down by
     :return: None
     """
-    print("\r", end="")
-    for line in range(num_lines):
-        print("\033[E", end="")
+    sys.stdout.write("\r" + "\033[E" * num_lines)
 
 
 def clear_prev_lines(num_lines=0):
@@ -98,9 +104,7 @@ def clear_prev_lines(num_lines=0):
     position that has to be cleared
     :return: None
     """
-    for line in range(num_lines):
-        print("\033[F", end="")
-        print("\033[2K", end="")
+    sys.stdout.write("\033[F\033[2K" * num_lines)
 
 
 def overwrite_prev_line(player, position, jump_space=0):
@@ -115,12 +119,12 @@ def overwrite_prev_line(player, position, jump_space=0):
     counted
     :return: None
     """
-    print("\033[" + str(position + jump_space) + "F", end="")
-    print("\033[2K", end="")
-    time.sleep(0.5)
-    print(player, end="")
+    sys.stdout.write("\033[" + str(position + jump_space) + "F\033[2K")
+    sys.stdout.flush()
+    scheduler.delay("redraw")
+    sys.stdout.write(
+        repr(player) + "\033[" + str(position + jump_space) + "E")
     sys.stdout.flush()
-    print("\033[" + str(position + jump_space) + "E", end="")
 
 
 def update_current_line(item):
@@ -131,7 +135,7 @@ def update_current_line(item):
     :return: None
     """
     print(item, end="\r")
-    time.sleep(1)
+    scheduler.delay("deal")
     sys.stdout.write("\033[2K")
 
 
@@ -0,0 +1,259 @@
+import math
+import random
+from blackjack import Game
+from hand import hand_blackjack
+from parallel import chunk_seeds, run_jobs
+from player import ComputerPlayer
+
+# Bot tournament: every entrant starts with the same bankroll and plays
+# against the dealer of its table, betting at least the table minimum (or
+# going all in when short of chips). Blackjack pays 3:2, other wins pay 1:1
+# and ties push. Players without chips are eliminated. Tournaments are
+# played in levels: every table plays a number of rounds in a worker process
+# (see parallel.run_jobs), then tables are closed and seats are rebalanced
+# as players drop out, and the minimum bet goes up, until one player is left.
+starting_bankroll = 1000
+minimum_bet = 10
+bet_growth = 1.25  # minimum bet factor from one level to the next
+seats_per_table = 6  # players per table, dealer excluded
+rounds_per_level = 50  # rounds played at every table in a level
+dealer_id = 0  # id of the dealer at every table, entrants are numbered from 1
+
+
+def outcome(player, dealer):
+    """
+    This function compares the final hand of a player with the dealer's
+    :param player: (class Player) player with a final hand
+    :param dealer: (class Dealer) dealer with a final hand
+    :return: (int) 1 if the player wins, 0 for a push, -1 if the player loses
+    """
+    if hand_blackjack[player.hand]:
+        return 0 if hand_blackjack[dealer.hand] else 1
+    if player.score > 21 or hand_blackjack[dealer.hand]:
+        return -1
+    if dealer.score > 21 or player.score > dealer.score:
+        return 1
+    return 0 if player.score == dealer.score else -1
+
+
+def payout(player, dealer):
+    """
+    This function computes the net result of a player's bet against the
+    dealer at the end of a round
+    :param player: (class Player) player with a bet and a final hand
+    :param dealer: (class Dealer) dealer with a final hand
+    :return: (int) chips won (negative if lost, 0 for a push)
+    """
+    if hand_blackjack[player.hand] and not hand_blackjack[dealer.hand]:
+        return player.bet * 3 // 2
+    return outcome(player, dealer) * player.bet
+
+
+def play_rounds(game, rounds, minimum, survivors=0):
+    """
+    This function plays rounds at a table with bets, eliminating the
+    players who lost all their chips
+    :param game: (class Game) headless table, with bankrolls set
+    :param rounds: (int) number of rounds to be played
+    :param minimum: (int) minimum bet of the table
+    :param survivors: (int) players left at which the table stops (1 at the
+    final table, where the last player left wins)
+    :return: (dict) round of elimination and bankroll before that round of
+    every eliminated player by id
+    """
+    dealer = game.dealer
+    eliminated = {}
+    for round_number in range(rounds):
+        if len(game.table) - 1 <= survivors:
+            break
+        players = game.table[:-1]
+        bankrolls = [player.bankroll for player in players]
+        for player in players:
+            player.wager(minimum)
+        game.play_round()
+        for player in players:
+            player.bankroll += payout(player, dealer)
+        game.reset_round()
+        broke = set()
+        for player, bankroll in zip(players, bankrolls):
+            if player.bankroll <= 0:
+                broke.add(player.id)
+                eliminated[player.id] = (round_number, bankroll)
+        if broke:
+            game.remove_players(broke)
+    return eliminated
+
+
+def table_job(job):
+    """
+    This function plays a level at one table, in a worker process
+    :param job: (tuple) seed of the table, bot class, entrants (id, name,
+    threshold and bankroll), rounds, minimum bet and number of players at
+    which the table stops (see play_rounds)
+    :return: (tuple) bankroll of every entrant by id, and round of
+    elimination (with the bankroll before that round) of the eliminated ones
+    by id
+    """
+    seed, bot_class, entrants, rounds, minimum, survivors = job
+    game = Game(0, 0, headless=True, rng=random.Random(seed),
+                bot_class=bot_class)
+    game.seat_players()
+    game.dealer.id = dealer_id
+    players = []
+    for player_id, name, threshold, bankroll in entrants:
+        player = bot_class(name, True, game.rng)
+        player.id = player_id
+        player.threshold = threshold
+        player.bankroll = bankroll
+        players.append(player)
+    game.add_players(players)
+    eliminated = play_rounds(game, rounds, minimum, survivors)
+    return ({player.id: player.bankroll for player in players}, eliminated)
+
+
+class Tournament:
+
+    def __init__(self, players, seed=0, bot_class=ComputerPlayer,
+                 bankroll=starting_bankroll, minimum=minimum_bet,
+                 seats=seats_per_table, rounds=rounds_per_level):
+        """
+        Class Tournament - a bot tournament across many tables. Attributes:
+        rng = (random.Random) random number generator of the seating and of
+        the table seeds
+        bot_class = class of the entrants
+        names = (dict) name of every entrant by id
+        thresholds = (dict) threshold of every entrant by id
+        bankrolls = (dict) chips of every entrant by id
+        tables = (list(list(int))) ids of the players seated at every table
+        eliminated = (list(int)) ids of the eliminated players, in the order
+        they were eliminated
+        minimum = (int) minimum bet of the current level
+        seats = (int) players per table
+        rounds = (int) rounds played at every table in a level
+        level = (int) number of levels played
+        :param players: (int) number of entrants
+        :param seed: (int) master seed, the same seed gives the same
+        tournament with any number of workers
+        :param bot_class: class of the entrants (ComputerPlayer by default)
+        :param bankroll: (int) starting chips of every entrant
+        :param minimum: (int) minimum bet of the first level
+        :param seats: (int) players per table
+        :param rounds: (int) rounds played at every table in a level
+        """
+        self.rng = random.Random(seed)
+        self.bot_class = bot_class
+        ids = range(dealer_id + 1, dealer_id + 1 + players)
+        self.names = {player_id: "Player" + str(player_id)
+                      for player_id in ids}
+        self.thresholds = {player_id: self.rng.randint(14, 18)
+                           for player_id in ids}
+        self.bankrolls = dict.fromkeys(ids, bankroll)
+        self.eliminated = []
+        self.minimum = minimum
+        self.seats = seats
+        self.rounds = rounds
+        self.level = 0
+        self.tables = []
+        self.seat_players()
+
+    @property
+    def active(self):
+        """
+        The number of players still in the tournament
+        :return: (int) number of players with chips
+        """
+        return sum(len(table) for table in self.tables)
+
+    def seat_players(self):
+        """
+        This method draws the seats of the entrants, spreading them evenly
+        over as few tables as possible
+        :return: None
+        """
+        ids = list(self.bankrolls)
+        self.rng.shuffle(ids)
+        count = math.ceil(len(ids) / self.seats)
+        self.tables = [ids[index::count] for index in range(count)]
+
+    def rebalance(self):
+        """
+        This method closes the tables no longer needed after eliminations,
+        moving their players to the emptiest tables, then moves players from
+        the fullest tables until no two tables differ by more than one player
+        :return: None
+        """
+        tables = [table for table in self.tables if table]
+        needed = math.ceil(sum(len(table) for table in tables) / self.seats)
+        tables.sort(key=len)
+        while len(tables) > needed:
+            closed = tables.pop(0)
+            for player_id in closed:
+                min(tables, key=len).append(player_id)
+        while tables:
+            smallest = min(tables, key=len)
+            largest = max(tables, key=len)
+            if len(largest) - len(smallest) <= 1:
+                break
+            smallest.append(largest.pop(self.rng.randrange(len(largest))))
+        self.tables = tables
+
+    def play_level(self, workers=None):
+        """
+        This method plays a level: every table plays its rounds (in parallel
+        across worker processes), the eliminated players leave, the seats
+        are rebalanced and the minimum bet goes up
+        :param workers: (int) number of worker processes (None for one per
+        core)
+        :return: (list(int)) ids of the players eliminated in the level
+        """
+        seeds = chunk_seeds(self.rng.getrandbits(64), len(self.tables))
+        # the final table stops as soon as one player is left
+        survivors = 1 if len(self.tables) == 1 else 0
+        jobs = [(seed, self.bot_class,
+                 [(player_id, self.names[player_id],
+                   self.thresholds[player_id], self.bankrolls[player_id])
+                  for player_id in table], self.rounds, self.minimum,
+                 survivors)
+                for seed, table in zip(seeds, self.tables)]
+        eliminated = {}
+        for bankrolls, table_eliminated in run_jobs(table_job, jobs, workers):
+            self.bankrolls.update(bankrolls)
+            eliminated.update(table_eliminated)
+        # earlier rounds go out first, then the players who had fewer chips
+        # before the round, and the player id breaks the remaining ties
+        order = sorted(eliminated, key=lambda player_id: (
+            *eliminated[player_id], player_id))
+        self.eliminated.extend(order)
+        for table in self.tables:
+            table[:] = [player_id for player_id in table
+                        if player_id not in eliminated]
+        self.rebalance()
+        self.level += 1
+        self.minimum = int(self.minimum * bet_growth)
+        return order
+
+    def play(self, levels=None, workers=None):
+        """
+        This method plays levels until one player is left
+        :param levels: (int) maximum number of levels, None for no limit
+        :param workers: (int) number of worker processes (None for one per
+        core)
+        :return: (list(tuple)) standings (see standings)
+        """
+        while self.active > 1 and (levels is None or self.level < levels):
+            self.play_level(workers)
+        return self.standings()
+
+    def standings(self):
+        """
+        This method ranks the entrants: the players still in by chips, then
+        the eliminated players, the last eliminated first
+        :return: (list(tuple)) name and bankroll of every entrant, best first
+        """
+        playing = sorted((player_id for table in self.tables
+                          for player_id in table),
+                         key=lambda player_id: (-self.bankrolls[player_id],
+                                                player_id))
+        ranking = playing + self.eliminated[::-1]
+        return [(self.names[player_id], self.bankrolls[player_id])
+                for player_id in ranking]